@@ -3,22 +3,589 @@ Core HuggingFace downloader logic
 Handles repo scanning, split detection, downloading, and merging
 """
 
+import copy
+import ctypes
+import errno
+import functools
+import importlib.util
 import json
 import logging
+import operator
 import os
 import re
 import shutil
-import subprocess
-from collections.abc import Callable
+import struct
+import sys
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from types import SimpleNamespace
 
-from huggingface_hub import HfApi, hf_hub_download
-from safetensors.torch import load_file, save_file
+from huggingface_hub import (
+    HfApi,
+    constants,
+    get_session,
+    hf_hub_download,
+    hf_hub_url,
+    try_to_load_from_cache,
+)
+from huggingface_hub.utils import HfHubHTTPError, build_hf_headers
 from tqdm import tqdm
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+# Sent in the Hub user agent so requests can be attributed to this extension
+LIBRARY_NAME = "comfyui-hf-downloader"
+LIBRARY_VERSION = "0.1.0"
+
+DOWNLOAD_WORKERS_ENV = "HF_PARALLEL_DOWNLOADING_WORKERS"
+LEGACY_DOWNLOAD_WORKERS_ENV = "HF_DL_WORKERS"
+DEFAULT_DOWNLOAD_WORKERS = 8
+
+# Cap on file downloads in flight across all tasks, so parallel tasks don't flood the Hub
+DOWNLOAD_CONCURRENCY_ENV = "HF_DL_CONCURRENCY"
+DEFAULT_DOWNLOAD_CONCURRENCY = 8
+# Opt-in switch for multi-connection downloads; changes huggingface_hub settings process-wide
+FAST_TRANSFER_ENV = "HF_DL_FAST_TRANSFER"
+SCAN_CACHE_SIZE = 64
+# Most scan files kept on disk; older revisions of a repo are dropped on every write
+SCAN_DISK_CACHE_SIZE = 256
+REVISION_TTL = 60
+SCAN_MANY_WORKERS = 8
+CONFIG_FETCH_TIMEOUT = 10
+CONFIG_FETCH_WORKERS = 16
+MERGE_CHUNK_SIZE = 16 * 1024 * 1024
+# copy_file_range errors that mean "not supported here" rather than an I/O failure
+_COPY_FALLBACK_ERRNOS = frozenset(
+    {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+)
+DOWNLOAD_ATTEMPTS = 5
+MAX_RETRY_DELAY = 30
+_FICLONE = 0x40049409  # Linux ioctl: share the source file's extents with the target
+
+# scan_repo results keyed by (repo_id, commit sha, include_sizes), oldest first.
+# Also persisted under _scan_cache_dir() so they survive restarts.
+_scan_cache: dict[tuple[str, str, bool], list[dict]] = {}
+_scan_cache_lock = threading.Lock()
+
+# Repo commit sha lookups: (repo_id, authenticated) -> (monotonic time, sha)
+_revision_cache: dict[tuple[str, bool], tuple[float, str]] = {}
+_revision_cache_lock = threading.Lock()
+
+# Filename patterns, compiled once at import (scan_repo runs them for every file in a repo)
+_GGUF_QUANT_RE = re.compile(
+    r"(?:[._-])((?:q|iq)\d[A-Za-z0-9_]*|(?:f|bf)\d[A-Za-z0-9_]*)$", re.IGNORECASE
+)
+_VARIANT_RE = re.compile(
+    r"(?:[._-])((?:fp|bf)\d+[a-z0-9_]*|int\d+|bnb[-_]?4bit|bnb[-_]?8bit|nf4|nvfp4)$",
+    re.IGNORECASE,
+)
+_PRECISION_RE = re.compile(
+    r"[-_]((?:fp|bf)\d+[a-z0-9_]*|int\d+|bnb[-_]?4bit|bnb[-_]?8bit|nf4|nvfp4)",
+    re.IGNORECASE,
+)
+_SPLIT_RE = re.compile(r"^(.+?)-(\d+)-of-(\d+)\.safetensors$", re.IGNORECASE)
+_STRIP_SPLIT_RE = re.compile(r"^(.+?)-\d+-of-\d+\.safetensors$")
+_SPLIT_SUFFIX_RE = re.compile(r"-(\d+)-of-(\d+)\.safetensors$")
+# Same suffix, capturing only the shard total
+_SPLIT_TOTAL_RE = re.compile(r"-\d+-of-(\d+)\.safetensors$")
+# Fused safetensors filename pattern: stem (= split base), variant suffix and shard numbering
+_SAFETENSORS_NAME_RE = re.compile(
+    r"^(?P<stem>(?P<base>.+?)(?:(?P<sep>[._-])"
+    r"(?P<variant>(?:fp|bf)\d+[a-z0-9_]*|int\d+|bnb[-_]?4bit|bnb[-_]?8bit|nf4|nvfp4))?)"
+    r"(?:-(?P<shard>\d+)-of-(?P<total>\d+))?\.safetensors$",
+    re.IGNORECASE,
+)
+
+# Variant suffixes without internal separators, resolved by set lookup before _VARIANT_RE
+_KNOWN_VARIANTS = frozenset(
+    {"fp8", "fp16", "fp32", "fp64", "bf16", "int4", "int8", "nf4", "nvfp4", "bnb4bit", "bnb8bit"}
+)
+
+# Raw precision token as matched -> normalized name, precomputed for the common spellings
+_PRECISION_NAMES = {
+    raw: variant.replace("_", "-")
+    for variant in (*_KNOWN_VARIANTS, "bnb_4bit", "bnb_8bit")
+    for raw in (variant, variant.upper())
+}
+
+# Sort key for file metadata dicts
+_BY_NAME = operator.itemgetter("name")
+
+# Lowercased file extension -> model file kind handled by scan_repo
+_MODEL_EXTENSIONS = {
+    ".safetensors": "safetensors",
+    ".gguf": "gguf",
+    ".pt": "pytorch",
+    ".pth": "pytorch",
+}
+
+
+def _download_workers() -> int:
+    """Number of files downloaded concurrently, from HF_PARALLEL_DOWNLOADING_WORKERS"""
+    value = os.getenv(DOWNLOAD_WORKERS_ENV) or os.getenv(LEGACY_DOWNLOAD_WORKERS_ENV)
+    if not value:
+        return DEFAULT_DOWNLOAD_WORKERS
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning(
+            f"Invalid {DOWNLOAD_WORKERS_ENV}; using {DEFAULT_DOWNLOAD_WORKERS} download workers"
+        )
+        return DEFAULT_DOWNLOAD_WORKERS
+
+
+def _download_concurrency() -> int:
+    """Number of file downloads allowed in flight process-wide, from HF_DL_CONCURRENCY"""
+    value = os.getenv(DOWNLOAD_CONCURRENCY_ENV)
+    if not value:
+        return DEFAULT_DOWNLOAD_CONCURRENCY
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning(
+            f"Invalid {DOWNLOAD_CONCURRENCY_ENV}; "
+            f"allowing {DEFAULT_DOWNLOAD_CONCURRENCY} concurrent downloads"
+        )
+        return DEFAULT_DOWNLOAD_CONCURRENCY
+
+
+_download_slots = threading.BoundedSemaphore(_download_concurrency())
+
+
+def _enable_hf_transfer() -> None:
+    """
+    Turn on multi-connection downloads when HF_DL_FAST_TRANSFER is set.
+
+    This is opt-in because huggingface_hub settings are global: every other
+    node in the ComfyUI process downloads the same way afterwards. Recent
+    huggingface_hub releases download through hf_xet, so its high performance
+    mode is enabled. Older releases use the Rust hf_transfer downloader when it
+    is installed; they read HF_HUB_ENABLE_HF_TRANSFER once at import, so the
+    constant is flipped directly. An explicit setting in the environment wins.
+    """
+    if os.getenv(FAST_TRANSFER_ENV, "").strip().lower() not in ("1", "true", "yes", "on"):
+        return
+    if not hasattr(constants, "HF_HUB_ENABLE_HF_TRANSFER"):
+        if "HF_XET_HIGH_PERFORMANCE" not in os.environ:
+            os.environ["HF_XET_HIGH_PERFORMANCE"] = "1"
+            constants.HF_XET_HIGH_PERFORMANCE = True
+        return
+    if "HF_HUB_ENABLE_HF_TRANSFER" in os.environ:
+        return
+    if importlib.util.find_spec("hf_transfer") is None:
+        logger.warning(
+            "hf_transfer is not installed, large files will download over a single "
+            "connection. Run `pip install hf_transfer` for faster downloads"
+        )
+        return
+    os.environ["HF_HUB_ENABLE_HF_TRANSFER"] = "1"
+    constants.HF_HUB_ENABLE_HF_TRANSFER = True
+
+
+_enable_hf_transfer()
+
+
+def _scan_cache_dir() -> Path:
+    """Directory for scan results persisted across restarts"""
+    base = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "comfyui-hf-downloader" / "scan"
+
+
+def _scan_file(repo_id: str, revision: str, include_sizes: bool) -> Path:
+    """On-disk location of one cached scan, e.g. org--model@<sha>.json"""
+    suffix = "" if include_sizes else ".names"
+    return _scan_cache_dir() / f"{repo_id.replace('/', '--')}@{revision}{suffix}.json"
+
+
+def _read_scan_file(path: Path) -> list[dict] | None:
+    """Load a persisted scan, or None if it is missing or unreadable"""
+    try:
+        with path.open(encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.debug(f"Ignoring unreadable scan cache {path}: {e}")
+        return None
+
+
+def _write_scan_file(path: Path, result: list[dict]) -> None:
+    """Persist a scan atomically; failures only cost a rescan later"""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(result, f)
+        tmp_path.replace(path)
+    except OSError as e:
+        logger.debug(f"Could not write scan cache {path}: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return
+    _prune_scan_files(path)
+
+
+def _prune_scan_files(latest: Path) -> None:
+    """
+    Drop cached scans of other revisions of the same repo, then the oldest files
+    beyond SCAN_DISK_CACHE_SIZE, so the cache directory stays bounded
+    """
+    repo, _, revision = latest.name.partition("@")
+    revision = revision.split(".", 1)[0]
+    try:
+        entries = []
+        for path in latest.parent.glob("*.json"):
+            name_repo, _, name_revision = path.name.partition("@")
+            if name_repo == repo and name_revision.split(".", 1)[0] != revision:
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        entries.sort(reverse=True)
+        for _, path in entries[SCAN_DISK_CACHE_SIZE:]:
+            if path != latest:
+                path.unlink(missing_ok=True)
+    except OSError as e:
+        logger.debug(f"Could not prune scan cache {latest.parent}: {e}")
+
+
+def _remember_scan(cache_key: tuple[str, str, bool], result: list[dict]) -> None:
+    """Store a scan in the in-memory cache, evicting the oldest entries"""
+    snapshot = copy.deepcopy(result)
+    with _scan_cache_lock:
+        _scan_cache.pop(cache_key, None)
+        _scan_cache[cache_key] = snapshot
+        while len(_scan_cache) > SCAN_CACHE_SIZE:
+            _scan_cache.pop(next(iter(_scan_cache)))
+
+
+def _cached_scan(repo_id: str, revision: str, include_sizes: bool) -> list[dict] | None:
+    """
+    Look up a scan in memory, then on disk. A full scan also answers a names-only request.
+    Returns a copy the caller may modify.
+    """
+    keys = [(repo_id, revision, include_sizes)]
+    if not include_sizes:
+        keys.append((repo_id, revision, True))
+
+    with _scan_cache_lock:
+        for key in keys:
+            if key in _scan_cache:
+                return copy.deepcopy(_scan_cache[key])
+
+    for key in keys:
+        result = _read_scan_file(_scan_file(*key))
+        if result is not None:
+            _remember_scan(key, result)
+            return result
+    return None
+
+
+def _is_scanned_file(path: str) -> bool:
+    """
+    Whether scan_repo needs a repo path: files with one of the model extensions,
+    plus config.json files, which tell it where a config name can be looked up
+    """
+    slash = path.rfind("/")
+    if path[slash + 1 :] == "config.json":
+        return True
+    dot = path.rfind(".")
+    return dot > slash + 1 and path[dot:].lower() in _MODEL_EXTENSIONS
+
+
+def _stem(filename: str) -> str:
+    """Same as Path(filename).stem for a bare filename, without building a Path"""
+    dot = filename.rfind(".")
+    return filename[:dot] if 0 < dot < len(filename) - 1 else filename
+
+
+def _suffix(filename: str) -> str:
+    """Same as Path(filename).suffix for a bare filename, without building a Path"""
+    dot = filename.rfind(".")
+    return filename[dot:] if 0 < dot < len(filename) - 1 else ""
+
+
+def _normalize_precision(raw: str) -> str:
+    """Lowercase a matched precision token and use dashes (BNB_4bit -> bnb-4bit)"""
+    name = _PRECISION_NAMES.get(raw)
+    return name if name is not None else raw.lower().replace("_", "-")
+
+
+# Network error classes of requests/httpx, matched by name so neither has to be imported
+_TRANSIENT_ERROR_NAMES = frozenset({"ConnectionError", "Timeout", "TransportError"})
+
+
+def _is_transient(exc: BaseException | None) -> bool:
+    """
+    Whether a download error is worth retrying: connection problems, timeouts,
+    HTTP 429 and 5xx. Follows the exception chain, since hf_hub_download wraps
+    network failures in LocalEntryNotFoundError.
+    """
+    while exc is not None:
+        if isinstance(exc, HfHubHTTPError):
+            status = getattr(getattr(exc, "response", None), "status_code", None)
+            if status == 429 or (status is not None and status >= 500):
+                return True
+        elif isinstance(exc, ConnectionError | TimeoutError) or any(
+            cls.__name__ in _TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__
+        ):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+def _sorted_by_name(files: list[dict]) -> list[dict]:
+    """File metadata ordered by name; most groups hold a single file, which needs no sort"""
+    if len(files) <= 1:
+        return files
+    return sorted(files, key=_BY_NAME)
+
+
+def _compute_precision(files: list[dict], key: str) -> str | None:
+    """
+    The single precision shared by a group's files, "mixed" if they differ,
+    or None if no file has one.
+    """
+    precision = None
+    for file_meta in files:
+        value = file_meta.get(key)
+        if not value:
+            continue
+        if precision is None:
+            precision = value
+        elif value != precision:
+            return "mixed"
+    return precision
+
+
+def _split_variant(stem: str) -> tuple[str, str | None]:
+    """
+    Split a trailing precision/quantization variant (fp16, bf16, fp8_e4m3fn, ...) off a stem.
+
+    Plain suffixes like "_fp16" are answered with a set lookup; compound ones such as
+    "_fp8_e4m3fn" or "-bnb_4bit" fall back to _VARIANT_RE.
+    """
+    sep = max(stem.rfind("."), stem.rfind("_"), stem.rfind("-"))
+    if sep > 0:
+        tail = stem[sep + 1 :].lower()
+        if tail in _KNOWN_VARIANTS:
+            # The regex keeps the longest suffix, which can only start earlier on an fp/bf run
+            head = stem[:sep].lower()
+            if "fp" not in head and "bf" not in head:
+                return stem[:sep], tail
+
+    match = _VARIANT_RE.search(stem)
+    if not match:
+        return stem, None
+    return stem[: match.start()], match.group(1).lower()
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """
+    Create dst as a copy-on-write clone of src (btrfs, XFS, ...).
+    Returns False, leaving no dst behind, when the filesystem can't do it.
+    """
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    try:
+        with src.open("rb") as src_file, dst.open("wb") as dst_file:
+            fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _place_file(src: Path, dst: Path) -> str:
+    """
+    Put a cached file at dst without copying data where possible.
+    Tries a hardlink, then a reflink, then falls back to a full copy.
+    Returns a short description of what was done.
+    """
+    try:
+        os.link(src, dst)
+        return "Hardlinked"
+    except OSError as e:
+        logger.debug(f"Hardlink failed for {dst}: {e}")
+
+    if _reflink(src, dst):
+        return "Reflinked"
+
+    logger.warning(f"Could not link {dst} to the HF cache, copying instead")
+    _fast_copy(src, dst)
+    return "Copied"
+
+
+def _replace_output(src: Path, dst: Path) -> str:
+    """Place a cached file at dst, replacing any file already there"""
+    if dst.exists() or dst.is_symlink():
+        if dst.is_dir():
+            raise RuntimeError(f"Output path is a directory: {dst}")
+        dst.unlink()
+    # Snapshot entries are symlinks into blobs/, link the blob itself
+    return _place_file(src.resolve(), dst)
+
+
+def _fast_copy(src: Path, dst: Path) -> None:
+    """
+    copy2 equivalent that moves the data with copy_file_range where supported.
+    """
+    try:
+        with src.open("rb") as src_file, dst.open("wb") as dst_file:
+            _copy_range(
+                src_file.fileno(), dst_file.fileno(), 0, os.fstat(src_file.fileno()).st_size
+            )
+    except BaseException:
+        dst.unlink(missing_ok=True)
+        raise
+    shutil.copystat(src, dst)
+
+
+@functools.lru_cache(maxsize=256)
+def _fetch_config(repo_id: str, folder: str, token: str | None) -> dict:
+    """
+    Fetch a folder's config.json with a single GET on the resolve URL.
+    Skips hf_hub_download's metadata round trip and cache write, since the
+    file is only read once for naming. A missing config.json is cached as an
+    empty dict so folders without one are not re-requested; other failures
+    are not cached.
+    """
+    url = hf_hub_url(repo_id, f"{folder}/config.json")
+    response = get_session().get(
+        url,
+        headers=build_hf_headers(
+            token=token, library_name=LIBRARY_NAME, library_version=LIBRARY_VERSION
+        ),
+        timeout=CONFIG_FETCH_TIMEOUT,
+    )
+    if response.status_code == 404:
+        return {}
+    response.raise_for_status()
+    return response.json()
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, nbytes: int) -> None:
+    """
+    Copy nbytes starting at offset in src_fd to dst_fd's current position.
+    Uses copy_file_range so the data stays in the kernel (or is reflinked) where
+    supported, otherwise a bounded read/write loop.
+    """
+    end = offset + nbytes
+    if hasattr(os, "copy_file_range"):
+        try:
+            while offset < end:
+                copied = os.copy_file_range(
+                    src_fd, dst_fd, min(end - offset, MERGE_CHUNK_SIZE), offset
+                )
+                if not copied:
+                    raise RuntimeError("Unexpected end of shard")
+                offset += copied
+            return
+        except OSError as e:
+            if e.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+            logger.debug(f"copy_file_range unavailable ({e}), copying through userspace")
+
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    while offset < end:
+        chunk = os.read(src_fd, min(end - offset, MERGE_CHUNK_SIZE))
+        if not chunk:
+            raise RuntimeError("Unexpected end of shard")
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dst_fd, view) :]
+        offset += len(chunk)
+
+
+def _fadvise(fd: int, advice: str) -> None:
+    """Give the kernel an access-pattern hint for a whole file, where posix_fadvise exists"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+    except OSError as e:
+        logger.debug(f"posix_fadvise({advice}) failed: {e}")
+
+
+# fallocate(2) flag: reserve blocks without changing the file size
+FALLOC_FL_KEEP_SIZE = 0x01
+
+
+@functools.cache
+def _libc_fallocate() -> Callable[[int, int, int, int], int] | None:
+    """
+    fallocate(2) from libc on Linux, or None elsewhere
+    Unlike posix_fallocate it fails with EOPNOTSUPP instead of writing every block
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fallocate = getattr(libc, "fallocate64", None) or libc.fallocate
+    except (OSError, AttributeError):
+        return None
+    fallocate.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64)
+    fallocate.restype = ctypes.c_int
+    return fallocate
+
+
+def _preallocate(fd: int, size: int) -> None:
+    """
+    Reserve size bytes for a file about to be written, failing fast when the disk is full
+    Uses native fallocate(2) where the filesystem has it; otherwise only checks free space
+    """
+    if size <= 0:
+        return
+    fallocate = _libc_fallocate()
+    if fallocate is not None:
+        if fallocate(fd, FALLOC_FL_KEEP_SIZE, 0, size) == 0:
+            return
+        err = ctypes.get_errno()
+        if err == errno.ENOSPC:
+            raise OSError(err, os.strerror(err))
+        logger.debug(f"fallocate unavailable ({os.strerror(err)}), checking free space instead")
+    _check_free_space(fd, size)
+
+
+def _check_free_space(fd: int, size: int) -> None:
+    """Raise ENOSPC if the filesystem holding fd has less than size bytes free"""
+    if not hasattr(os, "fstatvfs"):
+        return
+    try:
+        stats = os.fstatvfs(fd)
+    except OSError:
+        return
+    if stats.f_bavail * stats.f_frsize < size:
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+
+def _shard_sort_key(path: str) -> tuple[int, str]:
+    """Order shard paths by their numeric shard index, so unpadded numbering sorts correctly"""
+    match = _SPLIT_SUFFIX_RE.search(path)
+    return (int(match.group(1)) if match else 0, path)
+
+
+def _read_safetensors_header(path: str) -> tuple[dict, int]:
+    """
+    Read the JSON header of a safetensors file without touching tensor data.
+    Returns (header, data_start) where data_start is the byte offset of the data buffer.
+    """
+    with Path(path).open("rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    return header, 8 + header_len
+
 
 class ProgressTqdm(tqdm):
     """Custom tqdm class that reports progress via callback"""
@@ -52,12 +619,65 @@ class ProgressTqdm(tqdm):
         return result
 
 
+class _ShardProgress:
+    """
+    Combined byte progress of shards downloading concurrently
+    Each shard's tqdm reports its own bytes; this sums them under a lock so the
+    download stage shows one bytes-done/bytes-total figure instead of jumping between shards
+    """
+
+    def __init__(self, callback: Callable[[str, int, int, str], None], total_files: int):
+        self.callback = callback
+        self.total_files = total_files
+        self.files_done = 0
+        self.done_bytes = 0
+        self.total_bytes = 0
+        self._shards: dict[int, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def shard_callback(self, index: int) -> Callable[[str, int, int, str], None]:
+        """Progress callback for the ProgressTqdm of shard index"""
+
+        def report(stage: str, current: int, total: int, message: str) -> None:
+            self._set(index, current, total)
+
+        return report
+
+    def finish(self, index: int, path: str, filename: str) -> None:
+        """Count a shard as complete, using its size on disk (cached shards report no bytes)"""
+        try:
+            size = Path(path).stat().st_size
+        except OSError:
+            size = None
+        with self._lock:
+            self.files_done += 1
+            if size is None:
+                size = self._shards.get(index, (0, 0))[1]
+        self._set(index, size, size, f"Downloaded {filename}")
+
+    def _set(self, index: int, done: int, total: int, message: str | None = None) -> None:
+        with self._lock:
+            old_done, old_total = self._shards.get(index, (0, 0))
+            self._shards[index] = (done, total)
+            self.done_bytes += done - old_done
+            self.total_bytes += total - old_total
+            if message is None:
+                message = (
+                    f"Downloading {self.total_files} file(s), {self.files_done} done: "
+                    f"{self.done_bytes / (1024**3):.2f}GB / {self.total_bytes / (1024**3):.2f}GB"
+                )
+            # Reported under the lock so concurrent shards can't publish totals out of order
+            self.callback("download", self.done_bytes, self.total_bytes, message)
+
+
 class HFDownloader:
     """Downloads and merges split safetensor files and single GGUF/PyTorch (.pt/.pth) files from HuggingFace repos"""
 
     def __init__(self):
         self.hf_token = os.getenv("HF_TOKEN")
-        self.api = HfApi(token=self.hf_token) if self.hf_token else HfApi()
+        self.api = HfApi(
+            token=self.hf_token, library_name=LIBRARY_NAME, library_version=LIBRARY_VERSION
+        )
 
     def _extract_gguf_quant(self, filename: str) -> str | None:
         """
@@ -66,76 +686,103 @@ class HFDownloader:
         if not filename.lower().endswith(".gguf"):
             return None
 
-        stem = Path(filename).stem
-        match = re.search(
-            r"(?:[._-])((?:q|iq)\d[A-Za-z0-9_]*|(?:f|bf)\d[A-Za-z0-9_]*)$",
-            stem,
-            re.IGNORECASE,
-        )
+        match = _GGUF_QUANT_RE.search(_stem(filename))
         if match:
             return match.group(1).upper()
         return None
 
-    def _split_gguf_name(self, filename: str) -> tuple[str, str | None]:
+    def _split_gguf_name(self, filename: str, stem: str | None = None) -> tuple[str, str | None]:
         """
         Split a GGUF filename into base name and quant.
+        Callers that already computed the stem can pass it to skip recomputing it.
         """
-        stem = Path(filename).stem
-        quant = self._extract_gguf_quant(filename)
-        if not quant:
+        if stem is None:
+            stem = _stem(filename)
+        if not filename.lower().endswith(".gguf"):
+            return stem, None
+
+        match = _GGUF_QUANT_RE.search(stem)
+        if not match:
             return stem, None
 
-        base_name = re.sub(rf"[._-]{re.escape(quant)}$", "", stem, flags=re.IGNORECASE)
-        return base_name, quant
+        # The match starts at the separator, so slicing drops both separator and quant
+        return stem[: match.start()], match.group(1).upper()
 
     def _split_safetensors_name(self, filename: str) -> tuple[str, str | None]:
         """
         Split a safetensors filename into base name and variant suffix (e.g., fp16, fp8_e4m3fn).
         """
-        stem = Path(filename).stem
-        variant_pattern = re.compile(
-            r"(?:[._-])((?:fp|bf)\d+[a-z0-9_]*|int\d+|bnb[-_]?4bit|bnb[-_]?8bit|nf4|nvfp4)$",
-            re.IGNORECASE,
-        )
-        match = variant_pattern.search(stem)
-        if not match:
-            return stem, None
-
-        raw_variant = match.group(1)
-        base_name = re.sub(rf"[._-]{re.escape(raw_variant)}$", "", stem, flags=re.IGNORECASE)
-        return base_name, raw_variant.lower()
+        return _split_variant(_stem(filename))
 
-    def _list_repo_files_info(self, repo_id: str) -> list:
+    def _list_repo_files_info(self, repo_id: str) -> Iterator[SimpleNamespace]:
         """
-        Return file metadata with path and size across hf hub versions.
+        Stream model and config.json entries (path and size) from a single recursive
+        tree listing. Folders and other files are dropped as the listing is paged in.
         """
-        if hasattr(self.api, "list_files_info"):
-            return list(self.api.list_files_info(repo_id))
-
-        # Fallback for newer huggingface_hub versions where list_files_info was removed.
         try:
             tree = self.api.list_repo_tree(repo_id, repo_type="model", recursive=True)
         except TypeError:
             # Older versions may not accept repo_type; fall back to defaults.
             tree = self.api.list_repo_tree(repo_id, recursive=True)
 
-        files = []
         for entry in tree:
             if getattr(entry, "type", None) == "folder":
                 continue
             path = getattr(entry, "path", None) or getattr(entry, "rfilename", None)
-            if not path:
+            if not path or not _is_scanned_file(path):
                 continue
             size = getattr(entry, "size", None)
-            if size is None:
-                size = 0
-            files.append(SimpleNamespace(rfilename=path, size=size))
-        return files
+            yield SimpleNamespace(rfilename=path, size=size or 0)
+
+    def _list_repo_file_names(self, repo_id: str) -> Iterator[SimpleNamespace]:
+        """
+        Stream model and config.json paths only, with size 0. Cheaper than the full tree listing.
+        """
+        for path in self.api.list_repo_files(repo_id):
+            if _is_scanned_file(path):
+                yield SimpleNamespace(rfilename=path, size=0)
+
+    def _repo_revision(self, repo_id: str, use_cache: bool = True) -> str | None:
+        """
+        Return the current commit sha of a repo, or None if it cannot be resolved.
+        A sha seen within the last REVISION_TTL seconds is reused without a request.
+        """
+        key = (repo_id, self.hf_token is not None)
+        now = time.monotonic()
+        if use_cache:
+            with _revision_cache_lock:
+                cached = _revision_cache.get(key)
+            if cached and now - cached[0] < REVISION_TTL:
+                return cached[1]
 
-    def scan_repo(self, repo_id: str) -> list[dict]:
+        try:
+            revision = self.api.repo_info(repo_id).sha
+        except Exception as e:
+            logger.debug(f"Could not resolve revision for {repo_id}: {e}")
+            return None
+
+        if revision:
+            # Scan pools, config prefetches and downloads all resolve revisions concurrently
+            with _revision_cache_lock:
+                _revision_cache[key] = (now, revision)
+                if len(_revision_cache) > SCAN_CACHE_SIZE:
+                    # Drop expired entries; live ones are few and cheap
+                    for stale in [
+                        k for k, (ts, _) in _revision_cache.items() if now - ts >= REVISION_TTL
+                    ]:
+                        del _revision_cache[stale]
+        return revision
+
+    def scan_repo(
+        self, repo_id: str, force_refresh: bool = False, include_sizes: bool = True
+    ) -> list[dict]:
         """
         Scan a HuggingFace repo for safetensor, GGUF, and PyTorch (.pt/.pth) files
 
+        Results are cached per (repo_id, commit sha), in memory and on disk;
+        pass force_refresh=True to rescan.
+        With include_sizes=False only file names are listed and every size is reported as 0.
+
         Returns list of model groups with metadata:
         - path: subfolder path
         - files: list of filenames with metadata (name, size, precision)
@@ -145,223 +792,268 @@ class HFDownloader:
         - suggested_name: suggested output filename
         """
         try:
+            # A scan is a pure function of the repo commit, so reuse it while the sha is unchanged
+            revision = self._repo_revision(repo_id, use_cache=not force_refresh)
+            cache_key = (repo_id, revision, include_sizes)
+            if revision and not force_refresh:
+                cached = _cached_scan(repo_id, revision, include_sizes)
+                if cached is not None:
+                    logger.info(f"Using cached scan of {repo_id}@{revision[:8]}")
+                    return cached
+
             logger.info(f"Scanning HuggingFace repo: {repo_id}")
 
-            # Use list_files_info to get file metadata including sizes
-            files_info = self._list_repo_files_info(repo_id)
-
-            # Group safetensor files by base name and split pattern
-            safetensor_groups = {}
-            gguf_models = {}
-            pt_models = {}
-            split_pattern = re.compile(r"^(.+?)-(\d+)-of-(\d+)\.safetensors$", re.IGNORECASE)
-
-            for file_info in files_info:
-                f = file_info.rfilename
-                if f.lower().endswith(".safetensors"):
-                    parts = f.split("/")
-                    if len(parts) > 1:
-                        folder = "/".join(parts[:-1])
-                        filename = parts[-1]
-                    else:
-                        folder = "root"
-                        filename = f
+            if include_sizes:
+                files_info = self._list_repo_files_info(repo_id)
+            else:
+                files_info = self._list_repo_file_names(repo_id)
 
-                    split_match = split_pattern.match(filename)
-                    variant = None
-                    if split_match:
-                        base_name = split_match.group(1)
-                        group_key = ("split", folder, base_name)
-                        if group_key not in safetensor_groups:
-                            safetensor_groups[group_key] = {
-                                "folder": folder,
-                                "base_name": base_name,
-                                "files": [],
-                                "is_split": True,
-                                "split_info": {
-                                    "total": int(split_match.group(3)),
-                                    "pattern": split_pattern.pattern,
-                                },
-                            }
-                    else:
-                        base_name, variant = self._split_safetensors_name(filename)
-                        group_key = ("single", folder, base_name)
-                        if group_key not in safetensor_groups:
-                            safetensor_groups[group_key] = {
-                                "folder": folder,
-                                "base_name": base_name,
-                                "files": [],
-                                "is_split": False,
-                                "split_info": None,
-                            }
-
-                    # Extract precision from filename
-                    precision = self._extract_precision(filename)
+            result = self._classify_files(repo_id, files_info)
 
-                    # Store file metadata
-                    file_meta = {"name": filename, "size": file_info.size, "precision": precision}
-                    if variant:
-                        file_meta["variant"] = variant
-                    safetensor_groups[group_key]["files"].append(file_meta)
-                elif f.lower().endswith(".gguf"):
-                    parts = f.split("/")
-                    if len(parts) > 1:
-                        folder = "/".join(parts[:-1])
-                        filename = parts[-1]
-                    else:
-                        folder = "root"
-                        filename = f
+            logger.info(f"Found {len(result)} model group(s) in repo")
+            if revision:
+                _remember_scan(cache_key, result)
+                _write_scan_file(_scan_file(*cache_key), result)
+            return result
 
-                    base_name, quant = self._split_gguf_name(filename)
-                    group_key = (folder, base_name)
-                    if group_key not in gguf_models:
-                        gguf_models[group_key] = []
+        except Exception as e:
+            logger.error(f"Error scanning repo {repo_id}: {e}")
+            raise
 
-                    gguf_models[group_key].append(
-                        {"name": filename, "size": file_info.size, "quant": quant}
-                    )
-                elif f.lower().endswith((".pt", ".pth")):
-                    parts = f.split("/")
-                    if len(parts) > 1:
-                        folder = "/".join(parts[:-1])
-                        filename = parts[-1]
-                    else:
-                        folder = "root"
-                        filename = f
-
-                    # Extract base name (remove extension and any precision suffix)
-                    stem = Path(filename).stem
-                    base_name, variant = self._split_safetensors_name(stem)
-
-                    group_key = (folder, base_name)
-                    if group_key not in pt_models:
-                        pt_models[group_key] = []
-
-                    file_meta = {"name": filename, "size": file_info.size}
-                    if variant:
-                        file_meta["variant"] = variant
-                    pt_models[group_key].append(file_meta)
-
-            # Build result list for safetensors
-            result = []
-            for group in safetensor_groups.values():
-                folder = group["folder"]
-                files_list = sorted(group["files"], key=lambda x: x["name"])
-                is_split = group["is_split"]
-                split_info = group["split_info"]
-                file_count = len(files_list)
-
-                if is_split:
-                    total_size = sum(f["size"] for f in files_list)
-                else:
-                    total_size = files_list[0]["size"] if files_list else 0
-
-                precision_values = {f["precision"] for f in files_list if f.get("precision")}
-                precision = None
-                if len(precision_values) == 1:
-                    precision = next(iter(precision_values))
-                elif len(precision_values) > 1:
-                    precision = "mixed"
-
-                if is_split:
-                    filenames = [f["name"] for f in files_list]
-                    suggested_name = self._suggest_name(repo_id, folder, filenames, split_info)
+    def scan_repos(
+        self, repo_ids: list[str], force_refresh: bool = False, include_sizes: bool = True
+    ) -> dict[str, list[dict] | Exception]:
+        """
+        Scan several repos concurrently
+        Returns repo_id -> scan_repo result, or the exception that scan raised
+        """
+        results = {}
+        if not repo_ids:
+            return results
+        workers = min(len(repo_ids), SCAN_MANY_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                repo_id: executor.submit(self.scan_repo, repo_id, force_refresh, include_sizes)
+                for repo_id in repo_ids
+            }
+            for repo_id, future in futures.items():
+                try:
+                    results[repo_id] = future.result()
+                except Exception as e:
+                    results[repo_id] = e
+        return results
+
+    def _classify_files(self, repo_id: str, files_info: Iterable) -> list[dict]:
+        """
+        Group a repo's file listing into model entries (the scan_repo result format)
+        """
+        # Group safetensor files by base name and split pattern
+        safetensor_groups = {}
+        gguf_models = defaultdict(list)
+        pt_models = defaultdict(list)
+        # Folders the listing shows a config.json in
+        folders_with_config = set()
+
+        for file_info in files_info:
+            folder, sep, filename = file_info.rfilename.rpartition("/")
+            if not sep:
+                folder = "root"
+            if filename == "config.json":
+                folders_with_config.add(folder)
+                continue
+            dot = filename.rfind(".")
+            if dot <= 0:
+                continue
+            kind = _MODEL_EXTENSIONS.get(filename[dot:].lower())
+            if kind is None:
+                continue
+            stem = filename[:dot]
+
+            if kind == "safetensors":
+                # One match yields the shard suffix, the variant and usually the precision
+                name_match = _SAFETENSORS_NAME_RE.match(filename)
+                variant = name_match.group("variant")
+                if name_match.group("total"):
+                    # Shards keep the first precision token anywhere in the name
+                    variant = None
+                    precision = self._extract_precision(filename)
+                    base_name = name_match.group("stem")
+                    group_key = ("split", folder, base_name)
+                    if group_key not in safetensor_groups:
+                        safetensor_groups[group_key] = {
+                            "folder": folder,
+                            "base_name": base_name,
+                            "files": [],
+                            "is_split": True,
+                            "split_info": {
+                                "total": int(name_match.group("total")),
+                                "pattern": _SPLIT_RE.pattern,
+                            },
+                        }
                 else:
-                    if file_count == 1 and files_list:
-                        suggested_name = Path(files_list[0]["name"]).stem
+                    # A dash/underscore separated variant is also the precision;
+                    # only fall back to a full precision scan when there is none
+                    if variant and name_match.group("sep") != ".":
+                        precision = _normalize_precision(variant)
+                        variant = variant.lower()
                     else:
-                        suggested_name = group["base_name"] or (
-                            Path(files_list[0]["name"]).stem if files_list else "model"
-                        )
-
-                result.append(
-                    {
-                        "path": folder,
-                        "files": files_list,
-                        "is_split": is_split,
-                        "split_info": split_info,
-                        "file_count": file_count,
-                        "total_size": total_size,
-                        "suggested_name": suggested_name,
-                        "precision": precision,
-                        "file_type": "safetensors",
-                        "base_name": group["base_name"],
-                    }
+                        variant = variant.lower() if variant else None
+                        precision = self._extract_precision(filename)
+                    base_name = name_match.group("base")
+                    group_key = ("single", folder, base_name)
+                    if group_key not in safetensor_groups:
+                        safetensor_groups[group_key] = {
+                            "folder": folder,
+                            "base_name": base_name,
+                            "files": [],
+                            "is_split": False,
+                            "split_info": None,
+                        }
+                # Store file metadata
+                file_meta = {"name": filename, "size": file_info.size, "precision": precision}
+                if variant:
+                    file_meta["variant"] = variant
+                safetensor_groups[group_key]["files"].append(file_meta)
+            elif kind == "gguf":
+                base_name, quant = self._split_gguf_name(filename, stem)
+                gguf_models[(folder, base_name)].append(
+                    {"name": filename, "size": file_info.size, "quant": quant}
                 )
+            else:
+                # Extract base name (remove any precision suffix from the stem)
+                base_name, variant = self._split_safetensors_name(stem)
+
+                file_meta = {"name": filename, "size": file_info.size}
+                if variant:
+                    file_meta["variant"] = variant
+                pt_models[(folder, base_name)].append(file_meta)
+
+        # Fetch config.json names for every folder that needs one up front
+        config_folders = {
+            group["folder"] for group in safetensor_groups.values() if group["is_split"]
+        }
+        config_folders.update(folder for folder, base_name in gguf_models if not base_name)
+        config_folders.update(folder for folder, base_name in pt_models if not base_name)
+        config_folders.discard("root")
+        config_folders.discard("")
+        # Only request config.json where the listing has one; the rest have no config name
+        config_names = dict.fromkeys(config_folders - folders_with_config)
+        config_names.update(
+            self._prefetch_config_names(repo_id, config_folders & folders_with_config)
+        )
 
-            for (folder, base_name), files_list in gguf_models.items():
-                sorted_files = sorted(files_list, key=lambda x: x["name"])
-                display_size = sorted_files[0]["size"] if sorted_files else 0
-                quant_options = sorted(
-                    {f["quant"] for f in files_list if f.get("quant") is not None}
-                )
-                result.append(
-                    {
-                        "path": folder,
-                        "files": sorted_files,
-                        "is_split": False,
-                        "split_info": None,
-                        "file_count": len(files_list),
-                        "total_size": display_size,
-                        "suggested_name": base_name or self._suggest_name(repo_id, folder, [], None),
-                        "precision": None,
-                        "file_type": "gguf",
-                        "quant_options": quant_options,
-                        "base_name": base_name,
-                    }
-                )
+        result = list(
+            self._iter_model_groups(
+                repo_id, safetensor_groups, gguf_models, pt_models, config_names
+            )
+        )
+        return result
 
-            for (folder, base_name), files_list in pt_models.items():
-                sorted_files = sorted(files_list, key=lambda x: x["name"])
-                display_size = sorted_files[0]["size"] if sorted_files else 0
-
-                # Extract precision/variant info from files
-                precision_values = {f.get("variant") for f in files_list if f.get("variant")}
-                precision = None
-                if len(precision_values) == 1:
-                    precision = next(iter(precision_values))
-                elif len(precision_values) > 1:
-                    precision = "mixed"
-
-                # Determine file extension for suggested name
-                first_file_ext = Path(sorted_files[0]["name"]).suffix if sorted_files else ".pt"
-
-                result.append(
-                    {
-                        "path": folder,
-                        "files": sorted_files,
-                        "is_split": False,
-                        "split_info": None,
-                        "file_count": len(files_list),
-                        "total_size": display_size,
-                        "suggested_name": base_name or self._suggest_name(repo_id, folder, [], None),
-                        "precision": precision,
-                        "file_type": "pytorch",
-                        "base_name": base_name,
-                        "extension": first_file_ext,
-                    }
+    def _iter_model_groups(
+        self,
+        repo_id: str,
+        safetensor_groups: dict,
+        gguf_models: dict,
+        pt_models: dict,
+        config_names: dict[str, str | None],
+    ) -> Iterator[dict]:
+        """
+        Yield one result entry per model group collected by scan_repo
+        """
+        # Safetensors groups first, then GGUF, then PyTorch
+        for group in safetensor_groups.values():
+            folder = group["folder"]
+            files_list = _sorted_by_name(group["files"])
+            is_split = group["is_split"]
+            split_info = group["split_info"]
+            file_count = len(files_list)
+
+            precision = _compute_precision(files_list, "precision")
+
+            if is_split:
+                # One pass for both the shard names and their combined size
+                filenames = []
+                total_size = 0
+                for f in files_list:
+                    filenames.append(f["name"])
+                    total_size += f["size"]
+                suggested_name = self._suggest_name(
+                    repo_id, folder, filenames, split_info, config_names
                 )
+            else:
+                total_size = files_list[0]["size"] if files_list else 0
+                if file_count == 1 and files_list:
+                    suggested_name = _stem(files_list[0]["name"])
+                else:
+                    suggested_name = group["base_name"] or (
+                        _stem(files_list[0]["name"]) if files_list else "model"
+                    )
 
-            logger.info(f"Found {len(result)} model group(s) in repo")
-            return result
-
-        except Exception as e:
-            logger.error(f"Error scanning repo {repo_id}: {e}")
-            raise
+            yield {
+                "path": folder,
+                "files": files_list,
+                "is_split": is_split,
+                "split_info": split_info,
+                "file_count": file_count,
+                "total_size": total_size,
+                "suggested_name": suggested_name,
+                "precision": precision,
+                "file_type": "safetensors",
+                "base_name": group["base_name"],
+            }
+
+        for (folder, base_name), files_list in gguf_models.items():
+            sorted_files = _sorted_by_name(files_list)
+            display_size = sorted_files[0]["size"] if sorted_files else 0
+            quant_options = sorted({f["quant"] for f in files_list if f.get("quant") is not None})
+            yield {
+                "path": folder,
+                "files": sorted_files,
+                "is_split": False,
+                "split_info": None,
+                "file_count": len(files_list),
+                "total_size": display_size,
+                "suggested_name": base_name
+                or self._suggest_name(repo_id, folder, [], None, config_names),
+                "precision": None,
+                "file_type": "gguf",
+                "quant_options": quant_options,
+                "base_name": base_name,
+            }
+
+        for (folder, base_name), files_list in pt_models.items():
+            sorted_files = _sorted_by_name(files_list)
+            display_size = sorted_files[0]["size"] if sorted_files else 0
+
+            # Extract precision/variant info from files
+            precision = _compute_precision(files_list, "variant")
+
+            # Determine file extension for suggested name
+            first_file_ext = _suffix(sorted_files[0]["name"]) if sorted_files else ".pt"
+
+            yield {
+                "path": folder,
+                "files": sorted_files,
+                "is_split": False,
+                "split_info": None,
+                "file_count": len(files_list),
+                "total_size": display_size,
+                "suggested_name": base_name
+                or self._suggest_name(repo_id, folder, [], None, config_names),
+                "precision": precision,
+                "file_type": "pytorch",
+                "base_name": base_name,
+                "extension": first_file_ext,
+            }
 
     def _extract_precision(self, filename: str) -> str | None:
         """
         Extract precision type from filename (fp16, fp32, bf16, etc.)
         Returns precision string if found, None otherwise
         """
-        # Common precision patterns
-        precision_pattern = re.compile(
-            r"[-_]((?:fp|bf)\d+[a-z0-9_]*|int\d+|bnb[-_]?4bit|bnb[-_]?8bit|nf4|nvfp4)",
-            re.IGNORECASE,
-        )
-        match = precision_pattern.search(filename)
+        match = _PRECISION_RE.search(filename)
         if match:
-            return match.group(1).lower().replace("_", "-")
+            return _normalize_precision(match.group(1))
         return None
 
     def _detect_splits(self, files: list[str]) -> dict | None:
@@ -369,18 +1061,36 @@ class HFDownloader:
         Detect if files follow split pattern like model-00001-of-00003.safetensors
         Returns dict with 'total' count if split pattern detected, None otherwise
         """
-        pattern = re.compile(r"-(\d+)-of-(\d+)\.safetensors$")
-
         for f in files:
-            match = pattern.search(f)
+            # Cheap substring check rejects most names before the regex runs
+            if "-of-" not in f:
+                continue
+            match = _SPLIT_TOTAL_RE.search(f)
             if match:
-                total = int(match.group(2))
-                return {"total": total, "pattern": pattern.pattern}
+                total = int(match.group(1))
+                return {"total": total, "pattern": _SPLIT_SUFFIX_RE.pattern}
 
         return None
 
+    def _prefetch_config_names(self, repo_id: str, folders: set[str]) -> dict[str, str | None]:
+        """
+        Read config.json names for several folders concurrently
+        Returns a mapping of folder -> name (None when unavailable)
+        """
+        if not folders:
+            return {}
+        folders = sorted(folders)
+        with ThreadPoolExecutor(max_workers=min(len(folders), CONFIG_FETCH_WORKERS)) as executor:
+            names = executor.map(lambda f: self._get_name_from_config(repo_id, f), folders)
+            return dict(zip(folders, names, strict=True))
+
     def _suggest_name(
-        self, repo_id: str, folder: str, files: list[str], split_info: dict | None
+        self,
+        repo_id: str,
+        folder: str,
+        files: list[str],
+        split_info: dict | None,
+        config_names: dict[str, str | None] | None = None,
     ) -> str:
         """
         Suggest an output filename based on repo structure
@@ -390,21 +1100,29 @@ class HFDownloader:
         2. For folders: check config.json for _name_or_path, else use folder name
         3. For split files: extract base name from pattern
         4. Fallback: repo name
+
+        config_names holds names already fetched by _prefetch_config_names.
         """
+
+        def config_name_for(folder: str) -> str | None:
+            if config_names is not None and folder in config_names:
+                return config_names[folder]
+            return self._get_name_from_config(repo_id, folder)
+
         # Root folder with single file - use the actual filename
         if folder == "root" and len(files) == 1:
             # Strip extension but keep precision suffix
-            return Path(files[0]).stem
+            return _stem(files[0])
 
         # If split files, try to extract base name
         if split_info and files:
             # Remove the split suffix to get base name
-            match = re.search(r"^(.+?)-\d+-of-\d+\.safetensors$", files[0])
+            match = _STRIP_SPLIT_RE.match(files[0])
             if match:
                 base_name = match.group(1)
                 # For folders, also check config.json for better naming
                 if folder != "root":
-                    config_name = self._get_name_from_config(repo_id, folder)
+                    config_name = config_name_for(folder)
                     if config_name:
                         return config_name
                 return base_name
@@ -412,7 +1130,7 @@ class HFDownloader:
         # If folder has a meaningful name, try config.json first
         if folder != "root" and folder:
             # Try to get name from config.json
-            config_name = self._get_name_from_config(repo_id, folder)
+            config_name = config_name_for(folder)
             if config_name:
                 return config_name
 
@@ -430,13 +1148,7 @@ class HFDownloader:
         Returns the _name_or_path value or model_type if found
         """
         try:
-            config_path = f"{folder}/config.json"
-
-            # Download and parse config.json
-            local_config = hf_hub_download(repo_id=repo_id, filename=config_path)
-
-            with Path(local_config).open() as f:
-                config = json.load(f)
+            config = _fetch_config(repo_id, folder, self.hf_token)
 
             # Try _name_or_path first (e.g., "google/t5-v1_1-xxl")
             if "_name_or_path" in config:
@@ -463,6 +1175,7 @@ class HFDownloader:
         output_dir: str,
         output_name: str,
         progress_callback: Callable[[str, int, int, str], None] | None = None,
+        merge: bool = True,
     ) -> str:
         """
         Download files from HuggingFace and merge if split
@@ -474,9 +1187,11 @@ class HFDownloader:
             output_dir: Destination directory
             output_name: Output filename (without extension)
             progress_callback: Optional callback(stage, current, total, message)
+            merge: Merge split safetensors into one file. When False the shards are
+                linked into output_dir next to a model.safetensors.index.json
 
         Returns:
-            Path to the merged/downloaded file
+            Path to the merged/downloaded file, or to the index when not merging
         """
         try:
             Path(output_dir).mkdir(parents=True, exist_ok=True)
@@ -489,20 +1204,47 @@ class HFDownloader:
             if progress_callback:
                 progress_callback("download", 0, len(files), f"Downloading {len(files)} file(s)...")
 
-            downloaded_paths = []
-            for idx, filename in enumerate(files):
-                file_path = f"{folder_path}/{filename}" if folder_path != "root" else filename
-
-                if progress_callback:
-                    progress_callback("download", idx, len(files), f"Starting download: {filename}...")
+            # Pin every file to one commit so cached shards can be reused without a request
+            revision = self._repo_revision(repo_id)
 
-                cached_path = self._download_file(
-                    repo_id, file_path, progress_callback, file_index=idx, total_files=len(files)
-                )
-                downloaded_paths.append(cached_path)
+            # Shards are network bound, so fetch them concurrently and restore the
+            # requested order afterwards so merging stays deterministic
+            downloaded = {}
+            shard_progress = (
+                _ShardProgress(progress_callback, len(files)) if progress_callback else None
+            )
+            workers = min(len(files), _download_workers()) or 1
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {}
+                for idx, filename in enumerate(files):
+                    file_path = f"{folder_path}/{filename}" if folder_path != "root" else filename
+                    future = executor.submit(
+                        self._download_file,
+                        repo_id,
+                        file_path,
+                        shard_progress.shard_callback(idx) if shard_progress else None,
+                        file_index=idx,
+                        total_files=len(files),
+                        revision=revision,
+                    )
+                    futures[future] = (idx, filename)
 
-            if progress_callback:
-                progress_callback("download", len(files), len(files), "Download complete")
+                try:
+                    for future in as_completed(futures):
+                        idx, filename = futures[future]
+                        downloaded[filename] = future.result()
+                        if shard_progress:
+                            shard_progress.finish(idx, downloaded[filename], filename)
+                except BaseException:
+                    # Don't start shards that are still queued once one has failed
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+
+            downloaded_paths = [downloaded[filename] for filename in files]
+
+            if shard_progress:
+                total_bytes = shard_progress.total_bytes
+                progress_callback("download", total_bytes, total_bytes, "Download complete")
 
             # Merge if multiple files, otherwise just copy
             output_ext = Path(files[0]).suffix if files else ".safetensors"
@@ -511,34 +1253,33 @@ class HFDownloader:
             output_ext = output_ext.lower()
             output_path = str(Path(output_dir) / f"{output_name}{output_ext}")
 
-            if len(files) > 1:
+            if len(files) > 1 and not merge:
+                if output_ext != ".safetensors":
+                    raise RuntimeError("Only safetensors shards can be indexed.")
+                output_path = self._link_shards(
+                    downloaded_paths, output_dir, output_name, progress_callback
+                )
+            elif len(files) > 1:
                 if output_ext != ".safetensors":
                     raise RuntimeError("Only safetensors files can be merged.")
                 if progress_callback:
                     progress_callback("merge", 0, len(files), "Starting merge...")
 
-                self._merge_files(downloaded_paths, output_path, progress_callback)
+                size_bytes = self._merge_files(downloaded_paths, output_path, progress_callback)
 
                 if progress_callback:
-                    progress_callback("merge", len(files), len(files), "Merge complete")
+                    progress_callback(
+                        "merge",
+                        len(files),
+                        len(files),
+                        f"Merge complete ({size_bytes / (1024 * 1024):.1f} MB)",
+                    )
             else:
-                # Single file - prefer symlink from cache for faster loads
+                # Single file - hardlink from cache so no data is copied
                 if progress_callback:
                     progress_callback("copy", 0, 1, "Linking file from cache...")
 
-                output_path_obj = Path(output_path)
-                cached_path = Path(downloaded_paths[0])
-                try:
-                    if output_path_obj.exists() or output_path_obj.is_symlink():
-                        if output_path_obj.is_dir():
-                            raise RuntimeError(f"Output path is a directory: {output_path}")
-                        output_path_obj.unlink()
-                    output_path_obj.symlink_to(cached_path)
-                    action = "Linked"
-                except OSError as e:
-                    logger.warning(f"Symlink failed, falling back to copy: {e}")
-                    shutil.copy2(cached_path, output_path_obj)
-                    action = "Copied"
+                action = _replace_output(Path(downloaded_paths[0]), Path(output_path))
 
                 if progress_callback:
                     progress_callback("copy", 1, 1, f"{action} file")
@@ -550,28 +1291,6 @@ class HFDownloader:
             logger.error(f"Error downloading/merging model: {e}")
             raise
 
-    def _check_hf_cli(self) -> bool:
-        """Check if HF CLI is installed"""
-        try:
-            subprocess.run(["hf", "version"], capture_output=True, check=True)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
-
-    def _hf_login(self):
-        """Login to HuggingFace CLI with token"""
-        try:
-            subprocess.run(
-                ["hf", "auth", "login", "--token", self.hf_token],
-                capture_output=True,
-                check=True,
-                text=True,
-            )
-            logger.info("Successfully authenticated with HuggingFace")
-        except subprocess.CalledProcessError as e:
-            logger.warning(f"HF auth warning: {e.stderr}")
-            # Don't fail - token might already be cached
-
     def _download_file(
         self,
         repo_id: str,
@@ -579,83 +1298,211 @@ class HFDownloader:
         progress_callback: Callable[[str, int, int, str], None] | None = None,
         file_index: int = 0,
         total_files: int = 1,
+        revision: str | None = None,
     ) -> str:
         """
         Download a single file using HuggingFace Hub Python API (shows progress bars!)
+        A file already cached for the given commit is returned without any request
+        Transient network errors are retried with backoff, resuming the partial file
         Returns path to cached file
         """
-        try:
-            # Create custom tqdm class instance for this download
-            if progress_callback:
-                # Use our custom tqdm that reports progress
-                from functools import partial
-
-                custom_tqdm = partial(
-                    ProgressTqdm,
-                    callback=progress_callback,
-                    file_index=file_index,
-                    total_files=total_files,
-                )
-                cached_path = hf_hub_download(
-                    repo_id=repo_id,
-                    filename=file_path,
-                    token=self.hf_token,
-                    resume_download=True,
-                    tqdm_class=custom_tqdm,
-                )
-            else:
-                # No progress callback, use default tqdm (shows in console)
-                cached_path = hf_hub_download(
-                    repo_id=repo_id,
-                    filename=file_path,
-                    token=self.hf_token,
-                    resume_download=True,
+        if revision:
+            cached_path = try_to_load_from_cache(repo_id, file_path, revision=revision)
+            if isinstance(cached_path, str):
+                logger.info(f"Using cached {file_path} at {cached_path}")
+                return cached_path
+
+        download_kwargs = {
+            "repo_id": repo_id,
+            "filename": file_path,
+            "token": self.hf_token,
+            "library_name": LIBRARY_NAME,
+            "library_version": LIBRARY_VERSION,
+        }
+        if revision:
+            download_kwargs["revision"] = revision
+        if progress_callback:
+            # Use our custom tqdm that reports progress
+            download_kwargs["tqdm_class"] = functools.partial(
+                ProgressTqdm,
+                callback=progress_callback,
+                file_index=file_index,
+                total_files=total_files,
+            )
+        # Without a tqdm_class the default tqdm shows progress in the console
+
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            try:
+                # hf_hub_download keeps partial data in the cache and resumes it on its own
+                with _download_slots:
+                    cached_path = hf_hub_download(**download_kwargs)
+                logger.info(f"Downloaded {file_path} to {cached_path}")
+                return cached_path
+            except Exception as e:
+                if attempt == DOWNLOAD_ATTEMPTS or not _is_transient(e):
+                    logger.error(f"Error downloading {file_path}: {e}")
+                    raise
+                delay = min(2 ** (attempt - 1), MAX_RETRY_DELAY)
+                logger.warning(
+                    f"Download of {file_path} failed ({e}), "
+                    f"retrying in {delay}s ({attempt}/{DOWNLOAD_ATTEMPTS})"
                 )
-            logger.info(f"Downloaded {file_path} to {cached_path}")
-            return cached_path
-        except Exception as e:
-            logger.error(f"Error downloading {file_path}: {e}")
-            raise
+                time.sleep(delay)
+
+    def _link_shards(
+        self,
+        shard_paths: list[str],
+        output_dir: str,
+        output_name: str,
+        progress_callback: Callable[[str, int, int, str], None] | None = None,
+    ) -> str:
+        """
+        Link shards into output_dir as <name>-0000X-of-0000N.safetensors and write the
+        standard <name>.safetensors.index.json mapping each tensor to its shard.
+        Only headers are read, so no tensor data is copied or rewritten.
+        Returns path to the index file
+        """
+        shard_paths = sorted(shard_paths, key=_shard_sort_key)
+        total = len(shard_paths)
+        weight_map = {}
+        total_size = 0
+
+        for idx, shard_path in enumerate(shard_paths, start=1):
+            shard_name = f"{output_name}-{idx:05d}-of-{total:05d}.safetensors"
+            if progress_callback:
+                progress_callback("copy", idx - 1, total, f"Linking {shard_name}...")
+
+            header, _ = _read_safetensors_header(shard_path)
+            for key, info in header.items():
+                if key == "__metadata__":
+                    continue
+                weight_map[key] = shard_name
+                start, end = info["data_offsets"]
+                total_size += end - start
+
+            _replace_output(Path(shard_path), Path(output_dir) / shard_name)
+
+        index_path = Path(output_dir) / f"{output_name}.safetensors.index.json"
+        index = {"metadata": {"total_size": total_size}, "weight_map": weight_map}
+        index_path.write_text(json.dumps(index, indent=2), encoding="utf-8")
+
+        if progress_callback:
+            progress_callback("copy", total, total, f"Linked {total} shards")
+
+        return str(index_path)
 
     def _merge_files(
         self,
         file_paths: list[str],
         output_path: str,
         progress_callback: Callable[[str, int, int, str], None] | None = None,
-    ) -> None:
+    ) -> int:
         """
         Merge multiple safetensor files into one
-        Uses the proven 3-line merge approach
+        Rewrites the header and copies tensor bytes straight from the shards, in the kernel
+        where possible, so tensors are never materialized
+        Returns the size of the merged file in bytes
         """
         try:
             logger.info(f"Merging {len(file_paths)} safetensor files...")
-
-            # Load all shards
-            tensors = {}
-            for idx, shard_path in enumerate(sorted(file_paths)):
-                logger.info(f"Loading shard {idx + 1}/{len(file_paths)}: {Path(shard_path).name}")
+            shard_paths = sorted(file_paths, key=_shard_sort_key)
+
+            # Pass 1: read only the JSON headers. Later shards win on duplicate
+            # tensor names, matching the old dict.update() merge.
+            shards = []
+            owners = {}
+            metadata = {}
+            for idx, shard_path in enumerate(shard_paths):
+                logger.info(f"Indexing shard {idx + 1}/{len(shard_paths)}: {Path(shard_path).name}")
                 if progress_callback:
                     progress_callback(
                         "merge",
                         idx,
-                        len(file_paths),
-                        f"Loading shard {idx + 1}/{len(file_paths)}...",
+                        len(shard_paths),
+                        f"Indexing shard {idx + 1}/{len(shard_paths)}...",
                     )
-                tensors.update(load_file(shard_path))
+                header, data_start = _read_safetensors_header(shard_path)
+                metadata.update(header.pop("__metadata__", None) or {})
+                shards.append((shard_path, header, data_start))
+                for name in header:
+                    owners[name] = idx
+
+            # Lay tensors out back to back: shard order, then original offset order
+            merged_header = {"__metadata__": metadata} if metadata else {}
+            copy_plan = [[] for _ in shards]
+            offset = 0
+            for idx, (_, header, data_start) in enumerate(shards):
+                entries = sorted(header.items(), key=lambda item: item[1]["data_offsets"][0])
+                for name, info in entries:
+                    if owners[name] != idx:
+                        continue
+                    begin, end = info["data_offsets"]
+                    nbytes = end - begin
+                    merged_header[name] = {
+                        "dtype": info["dtype"],
+                        "shape": info["shape"],
+                        "data_offsets": [offset, offset + nbytes],
+                    }
+                    plan = copy_plan[idx]
+                    if plan and plan[-1][0] + plan[-1][1] == data_start + begin:
+                        # Contiguous with the previous tensor, extend that copy
+                        plan[-1] = (plan[-1][0], plan[-1][1] + nbytes)
+                    else:
+                        plan.append((data_start + begin, nbytes))
+                    offset += nbytes
+
+            header_bytes = json.dumps(merged_header, separators=(",", ":")).encode("utf-8")
+            # Pad with spaces so tensor data starts 8-byte aligned, as safetensors does
+            header_bytes += b" " * (-len(header_bytes) % 8)
 
-            logger.info(f"Loaded {len(tensors)} tensors total, saving merged file...")
+            logger.info(f"Indexed {len(owners)} tensors total, saving merged file...")
             if progress_callback:
                 progress_callback(
-                    "merge", len(file_paths), len(file_paths) + 1, "Saving merged file..."
+                    "merge", len(shard_paths), len(shard_paths) + 1, "Saving merged file..."
                 )
 
-            # Save as single file
-            save_file(tensors, output_path)
-
-            # Get file size for logging
-            size_mb = Path(output_path).stat().st_size / (1024 * 1024)
-            logger.info(f"Saved merged file: {output_path} ({size_mb:.1f} MB)")
+            # Pass 2: copy raw tensor byte ranges into place
+            output = Path(output_path)
+            try:
+                with output.open("wb") as out:
+                    _preallocate(out.fileno(), 8 + len(header_bytes) + offset)
+                    out.write(struct.pack("<Q", len(header_bytes)))
+                    out.write(header_bytes)
+                    # Tensor data is written straight to the fd from here on
+                    out.flush()
+                    for (shard_path, _, _), plan in zip(shards, copy_plan, strict=True):
+                        with Path(shard_path).open("rb") as src:
+                            _fadvise(src.fileno(), "POSIX_FADV_SEQUENTIAL")
+                            for src_offset, nbytes in plan:
+                                _copy_range(src.fileno(), out.fileno(), src_offset, nbytes)
+                            # Each shard is read once; don't let it crowd out the page cache
+                            _fadvise(src.fileno(), "POSIX_FADV_DONTNEED")
+            except BaseException:
+                output.unlink(missing_ok=True)
+                raise
+
+            # Length prefix + header + tensor data, known without stat'ing the output
+            size_bytes = 8 + len(header_bytes) + offset
+            logger.info(f"Saved merged file: {output_path} ({size_bytes / (1024 * 1024):.1f} MB)")
+            return size_bytes
 
         except Exception as e:
             logger.error(f"Error merging files: {e}")
             raise
+
+
+_default_downloader: HFDownloader | None = None
+_default_downloader_lock = threading.Lock()
+
+
+def get_downloader() -> HFDownloader:
+    """
+    Shared downloader for the server routes
+    Reusing one HfApi avoids rebuilding it, and re-reading the environment, per request
+    """
+    global _default_downloader
+    if _default_downloader is None:
+        with _default_downloader_lock:
+            if _default_downloader is None:
+                _default_downloader = HFDownloader()
+    return _default_downloader
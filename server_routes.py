@@ -4,7 +4,14 @@ Integrates with ComfyUI's server
 """
 
 import asyncio
+import functools
+import hashlib
+import json
 import logging
+import os
+import re
+import threading
+import time
 import traceback
 from pathlib import Path
 
@@ -14,9 +21,14 @@ from aiohttp import web
 
 # Handle both package and standalone imports
 try:
-    from .hf_downloader import HFDownloader
+    from .hf_downloader import get_downloader
 except ImportError:
-    from hf_downloader import HFDownloader
+    from hf_downloader import get_downloader
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -26,12 +38,136 @@ prompt_server = server.PromptServer.instance
 # Global state for download tasks
 download_tasks = {}
 download_progress = {}
+# Set by an abort, read by the download's worker thread
+download_cancels: dict[str, threading.Event] = {}
+
+# Finished tasks are kept for an hour so clients can still read the outcome,
+# but only the most recent MAX_FINISHED_TASKS of them
+TERMINAL_STATUSES = frozenset({"completed", "error", "cancelled"})
+FINISHED_TASK_TTL = 3600
+MAX_FINISHED_TASKS = 256
+REAPER_INTERVAL = 300
+_reaper_task = None
+
+# Progress updates within a stage are coalesced to at most 10 per second
+PROGRESS_INTERVAL = 0.1
+
+# How long an abort request waits for the download's worker thread to stop
+CANCEL_TIMEOUT = 5.0
+
+# Files shown in the downloaded-models list
+MODEL_FILE_SUFFIXES = (".safetensors", ".gguf")
+
+# HuggingFace repo ids are "owner/name" with letters, digits, "_", "." and "-"
+_REPO_ID_RE = re.compile(r"[A-Za-z0-9_.\-]+/[A-Za-z0-9_.\-]+")
+
+
+class DownloadCancelledError(Exception):
+    """Raised in a download's worker thread to stop it after the user aborted it"""
+
 
+def _json_dumps(data) -> str:
+    """Encode a response body, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data)
 
+
+json_response = functools.partial(web.json_response, dumps=_json_dumps)
+
+
+async def _read_json(request) -> dict:
+    """Decode a request's JSON body, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(await request.read())
+    return await request.json()
+
+
+def _mark_finished(progress: dict, **fields) -> None:
+    """
+    Move a progress entry to a terminal state, stamping when it finished
+    Terminal states are final, so an entry that already finished is left as is
+    """
+    if progress.get("status") in TERMINAL_STATUSES:
+        return
+    progress.update(fields)
+    progress.setdefault("finished_at", time.time())
+
+
+def _mark_cancelled(progress: dict) -> None:
+    """Record that a download was stopped at the user's request"""
+    _mark_finished(
+        progress,
+        status="cancelled",
+        stage="cancelled",
+        current=0,
+        total=0,
+        message="Download cancelled by user",
+    )
+
+
+def _mark_completed(progress: dict, output_path: str) -> None:
+    """Record that a download finished and where its output was saved"""
+    _mark_finished(
+        progress,
+        status="completed",
+        stage="done",
+        current=1,
+        total=1,
+        message=f"Successfully saved to {output_path}",
+        output_path=output_path,
+    )
+
+
+def reap_finished_tasks(now: float | None = None) -> int:
+    """
+    Drop tasks that finished more than FINISHED_TASK_TTL seconds ago, and the
+    oldest finished tasks beyond MAX_FINISHED_TASKS. Running tasks are never dropped
+    Returns the number of tasks removed
+    """
+    cutoff = (time.time() if now is None else now) - FINISHED_TASK_TTL
+    finished = sorted(
+        (
+            (progress.get("finished_at", cutoff), task_id)
+            for task_id, progress in download_progress.items()
+            if progress.get("status") in TERMINAL_STATUSES
+        ),
+        reverse=True,
+    )
+    expired = [
+        task_id
+        for rank, (finished_at, task_id) in enumerate(finished)
+        if rank >= MAX_FINISHED_TASKS or finished_at < cutoff
+    ]
+    for task_id in expired:
+        download_progress.pop(task_id, None)
+        download_tasks.pop(task_id, None)
+    return len(expired)
+
+
+async def _reap_periodically() -> None:
+    """Sweep finished tasks every REAPER_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(REAPER_INTERVAL)
+        removed = reap_finished_tasks()
+        if removed:
+            logger.info(f"Removed {removed} finished download task(s)")
+
+
+def _ensure_reaper() -> None:
+    """Start the sweep on the running loop the first time a download runs"""
+    global _reaper_task
+    if _reaper_task is None or _reaper_task.done():
+        _reaper_task = asyncio.create_task(_reap_periodically())
+
+
+@functools.lru_cache(maxsize=32)
 def get_model_dir(model_type: str) -> str:
     """
     Get the appropriate model directory based on type
     Uses ComfyUI's folder_paths to respect user configuration
+    Model folders are registered before extensions load, so results are cached; the
+    cache is bounded since model_type comes straight from the client
     """
     type_mapping = {
         "checkpoint": "checkpoints",
@@ -60,36 +196,98 @@ def get_model_dir(model_type: str) -> str:
         return str(Path(folder_paths.models_dir) / folder_name)
 
 
+@functools.lru_cache(maxsize=8)
+def _resolved_dir(path: str) -> str:
+    """Resolve a directory once, it does not move while the server runs"""
+    return os.path.realpath(path)
+
+
+def _is_within(directory: str, path: str) -> bool:
+    """Whether the resolved path lies inside the resolved directory"""
+    try:
+        return os.path.commonpath([directory, path]) == directory
+    except ValueError:  # Different drives on Windows
+        return False
+
+
 @prompt_server.routes.post("/hf_downloader/scan")
 async def scan_repo_handler(request):
     """
     Scan a HuggingFace repo for safetensor and GGUF files
 
     POST /hf_downloader/scan
-    Body: {"repo_id": "username/model"}
+    Body: {"repo_id": "username/model", "force_refresh": false, "include_sizes": true}
     """
     try:
-        data = await request.json()
+        data = await _read_json(request)
         repo_id = data.get("repo_id", "").strip()
+        force_refresh = bool(data.get("force_refresh", False))
+        include_sizes = bool(data.get("include_sizes", True))
 
         if not repo_id:
-            return web.json_response({"error": "repo_id is required"}, status=400)
+            return json_response({"error": "repo_id is required"}, status=400)
 
         # Validate repo_id format (should be username/model or org/model)
-        if "/" not in repo_id:
-            return web.json_response(
+        if not _REPO_ID_RE.fullmatch(repo_id):
+            return json_response(
                 {"error": "Invalid repo_id format. Expected: username/model"}, status=400
             )
 
-        downloader = HFDownloader()
-        models = await asyncio.to_thread(downloader.scan_repo, repo_id)
+        downloader = get_downloader()
+        models = await asyncio.to_thread(
+            downloader.scan_repo, repo_id, force_refresh, include_sizes
+        )
 
-        return web.json_response({"success": True, "repo_id": repo_id, "models": models})
+        return json_response({"success": True, "repo_id": repo_id, "models": models})
 
     except Exception as e:
         logger.error(f"Error scanning repo: {e}")
         logger.error(traceback.format_exc())
-        return web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
+
+
+@prompt_server.routes.post("/hf_downloader/scan_many")
+async def scan_many_handler(request):
+    """
+    Scan several HuggingFace repos concurrently
+
+    POST /hf_downloader/scan_many
+    Body: {"repo_ids": ["username/model", ...], "force_refresh": false, "include_sizes": true}
+    Returns per-repo models, or an error for repos that failed to scan
+    """
+    try:
+        data = await _read_json(request)
+        repo_ids = data.get("repo_ids")
+        force_refresh = bool(data.get("force_refresh", False))
+        include_sizes = bool(data.get("include_sizes", True))
+
+        if not isinstance(repo_ids, list) or not repo_ids:
+            return json_response({"error": "repo_ids must be a non-empty list"}, status=400)
+
+        repo_ids = [str(repo_id).strip() for repo_id in repo_ids]
+        invalid = [repo_id for repo_id in repo_ids if not _REPO_ID_RE.fullmatch(repo_id)]
+        if invalid:
+            error = f"Invalid repo_id format: {', '.join(invalid)}. Expected: username/model"
+            return json_response({"error": error}, status=400)
+
+        downloader = get_downloader()
+        scans = await asyncio.to_thread(
+            downloader.scan_repos, repo_ids, force_refresh, include_sizes
+        )
+
+        results = {}
+        for repo_id, scan in scans.items():
+            if isinstance(scan, Exception):
+                results[repo_id] = {"success": False, "error": str(scan)}
+            else:
+                results[repo_id] = {"success": True, "models": scan}
+
+        return json_response({"success": True, "results": results})
+
+    except Exception as e:
+        logger.error(f"Error scanning repos: {e}")
+        logger.error(traceback.format_exc())
+        return json_response({"error": str(e)}, status=500)
 
 
 @prompt_server.routes.post("/hf_downloader/download")
@@ -103,11 +301,12 @@ async def download_model_handler(request):
         "model_path": "subfolder",
         "files": ["file1.safetensors", "file2.gguf", ...],
         "output_name": "model_name",
-        "model_type": "checkpoint"
+        "model_type": "checkpoint",
+        "merge": true
     }
     """
     try:
-        data = await request.json()
+        data = await _read_json(request)
 
         repo_id = data.get("repo_id", "").strip()
         model_path = data.get("model_path", "root")
@@ -115,15 +314,16 @@ async def download_model_handler(request):
         output_name = data.get("output_name", "model")
         model_type = data.get("model_type", "checkpoint")
         custom_path = data.get("custom_path", "").strip()
+        merge = bool(data.get("merge", True))
 
         # Validation
         if not repo_id or not files or not output_name:
-            return web.json_response(
+            return json_response(
                 {"error": "repo_id, files, and output_name are required"}, status=400
             )
 
         if model_type == "custom" and not custom_path:
-            return web.json_response(
+            return json_response(
                 {"error": "custom_path is required when model_type is 'custom'"}, status=400
             )
 
@@ -132,7 +332,7 @@ async def download_model_handler(request):
 
         # Check if task already running
         if task_id in download_tasks and not download_tasks[task_id].done():
-            return web.json_response(
+            return json_response(
                 {"error": "Download already in progress for this model"}, status=409
             )
 
@@ -140,8 +340,9 @@ async def download_model_handler(request):
         if model_type == "custom":
             # Sanitize: reject absolute paths and path traversal
             if custom_path.startswith("/") or ".." in custom_path.split("/"):
-                return web.json_response(
-                    {"error": "Invalid custom path: must be relative and cannot contain '..'"}, status=400
+                return json_response(
+                    {"error": "Invalid custom path: must be relative and cannot contain '..'"},
+                    status=400,
                 )
             output_dir = str(Path(folder_paths.models_dir) / custom_path)
         else:
@@ -156,6 +357,7 @@ async def download_model_handler(request):
                 files=files,
                 output_dir=output_dir,
                 output_name=output_name,
+                merge=merge,
             )
         )
 
@@ -168,14 +370,12 @@ async def download_model_handler(request):
             "message": "Initializing download...",
         }
 
-        return web.json_response(
-            {"success": True, "task_id": task_id, "message": "Download started"}
-        )
+        return json_response({"success": True, "task_id": task_id, "message": "Download started"})
 
     except Exception as e:
         logger.error(f"Error starting download: {e}")
         logger.error(traceback.format_exc())
-        return web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
 
 
 @prompt_server.routes.get("/hf_downloader/status")
@@ -191,10 +391,10 @@ async def get_all_status_handler(request):
             entry = dict(progress)
             entry["task_id"] = task_id
             items.append(entry)
-        return web.json_response(items)
+        return json_response(items)
     except Exception as e:
         logger.error(f"Error getting status: {e}")
-        return web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
 
 
 @prompt_server.routes.get("/hf_downloader/progress/{task_id}")
@@ -208,25 +408,87 @@ async def get_progress_handler(request):
         task_id = request.match_info.get("task_id")
 
         if task_id not in download_progress:
-            return web.json_response({"error": "Task not found"}, status=404)
+            return json_response({"error": "Task not found"}, status=404)
+
+        progress = _refresh_progress(task_id)
+
+        # Pollers that already have this state get an empty 304 instead of the record
+        etag = _progress_etag(progress)
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        return json_response(progress, headers={"ETag": etag})
+
+    except Exception as e:
+        logger.error(f"Error getting progress: {e}")
+        return json_response({"error": str(e)}, status=500)
 
-        progress = download_progress[task_id]
 
-        # Check if task is done
-        if task_id in download_tasks:
-            task = download_tasks[task_id]
-            if task.done():
-                if task.exception():
-                    progress["status"] = "error"
-                    progress["message"] = str(task.exception())
-                elif progress["status"] != "completed":
-                    progress["status"] = "completed"
+@prompt_server.routes.post("/hf_downloader/progress_batch")
+async def progress_batch_handler(request):
+    """
+    Get progress of several download tasks in one request
 
-        return web.json_response(progress)
+    POST /hf_downloader/progress_batch
+    Body: {"task_ids": ["task_id", ...]}
+    Returns progress keyed by task id; unknown ids get a "not_found" status
+    """
+    try:
+        data = await _read_json(request)
+        task_ids = data.get("task_ids")
+
+        if not isinstance(task_ids, list):
+            return json_response({"error": "task_ids must be a list"}, status=400)
+
+        results = {}
+        for task_id in map(str, task_ids):
+            if task_id in download_progress:
+                results[task_id] = _refresh_progress(task_id)
+            else:
+                results[task_id] = {"status": "not_found", "error": "Task not found"}
+
+        # Same 304 shortcut as the single-task route, over the whole set of tasks
+        etag = _etag(
+            "|".join(f"{task_id}={_progress_etag(entry)}" for task_id, entry in results.items())
+        )
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        return json_response({"success": True, "tasks": results}, headers={"ETag": etag})
 
     except Exception as e:
         logger.error(f"Error getting progress: {e}")
-        return web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
+
+
+def _etag(state: str) -> str:
+    """Quoted ETag value for a state string"""
+    return f'"{hashlib.md5(state.encode(), usedforsecurity=False).hexdigest()[:16]}"'
+
+
+def _progress_etag(progress: dict) -> str:
+    """ETag for a progress entry, changing whenever any field a poller shows changes"""
+    return _etag(
+        ":".join(
+            str(progress.get(key)) for key in ("status", "stage", "current", "total", "message")
+        )
+    )
+
+
+def _refresh_progress(task_id: str) -> dict:
+    """Return a task's progress entry, first syncing it with its task if that has finished"""
+    progress = download_progress[task_id]
+
+    # Finished entries never change again, only in-flight ones need the task checked
+    if progress.get("status") not in TERMINAL_STATUSES and task_id in download_tasks:
+        task = download_tasks[task_id]
+        if task.done():
+            if task.exception():
+                _mark_finished(progress, status="error", message=str(task.exception()))
+            elif progress["status"] != "completed":
+                _mark_finished(progress, status="completed")
+
+    return progress
 
 
 async def run_download_task(
@@ -237,62 +499,91 @@ async def run_download_task(
     output_dir: str,
     output_name: str,
     name: str = "",
+    merge: bool = True,
 ) -> None:
     """
     Background task to run the download and merge operation
     """
 
+    _ensure_reaper()
+
+    # Updated in place: readers hold no copies and callbacks allocate nothing
+    progress = download_progress[task_id]
+    progress["name"] = name
+    cancel_event = download_cancels[task_id] = threading.Event()
+    last_emit = 0.0
+
     def progress_callback(stage, current, total, message):
-        """Update progress state"""
-        download_progress[task_id] = {
-            "status": "running",
-            "stage": stage,
-            "current": current,
-            "total": total,
-            "message": message,
-            "name": name,
-        }
+        """Update progress state, dropping updates that arrive faster than clients poll"""
+        nonlocal last_emit
+        # Worker threads can't be interrupted, so an aborted download stops at its next update
+        if cancel_event.is_set():
+            raise DownloadCancelledError("Download cancelled by user")
+        # Status belongs to the event loop; the worker only reports where it is
+        if progress.get("status") in TERMINAL_STATUSES:
+            return
+        now = time.monotonic()
+        boundary = stage != progress.get("stage") or current in (0, total)
+        if not boundary and now - last_emit < PROGRESS_INTERVAL:
+            return
+        last_emit = now
+        progress["stage"] = stage
+        progress["current"] = current
+        progress["total"] = total
+        progress["message"] = message
 
     try:
-        download_progress[task_id]["status"] = "running"
+        progress["status"] = "running"
 
-        downloader = HFDownloader()
+        downloader = get_downloader()
 
         # Run download in thread pool to avoid blocking
-        output_path = await asyncio.to_thread(
-            downloader.download_and_merge,
-            repo_id=repo_id,
-            folder_path=model_path,
-            files=files,
-            output_dir=output_dir,
-            output_name=output_name,
-            progress_callback=progress_callback,
+        worker = asyncio.ensure_future(
+            asyncio.to_thread(
+                downloader.download_and_merge,
+                repo_id=repo_id,
+                folder_path=model_path,
+                files=files,
+                output_dir=output_dir,
+                output_name=output_name,
+                progress_callback=progress_callback,
+                merge=merge,
+            )
         )
-
-        download_progress[task_id] = {
-            "status": "completed",
-            "stage": "done",
-            "current": 1,
-            "total": 1,
-            "message": f"Successfully saved to {output_path}",
-            "output_path": output_path,
-            "name": name,
-        }
+        try:
+            output_path = await asyncio.shield(worker)
+        except asyncio.CancelledError:
+            # Cancelled from anywhere (abort, startup queue, shutdown): stop the worker at
+            # its next progress update and only finish once it has stopped writing
+            cancel_event.set()
+            (result,) = await asyncio.gather(worker, return_exceptions=True)
+            if isinstance(result, BaseException):
+                _mark_cancelled(progress)
+            else:
+                # The worker finished before it noticed, so its output exists
+                _mark_completed(progress, result)
+            raise
+
+        _mark_completed(progress, output_path)
 
         logger.info(f"Download task {task_id} completed successfully")
 
+    except DownloadCancelledError:
+        _mark_cancelled(progress)
+        logger.info(f"Download task {task_id} stopped after abort")
+
     except Exception as e:
         logger.error(f"Download task {task_id} failed: {e}")
         logger.error(traceback.format_exc())
 
-        download_progress[task_id] = {
-            "status": "error",
-            "stage": "error",
-            "current": 0,
-            "total": 0,
-            "message": str(e),
-            "name": name,
-        }
+        _mark_finished(progress, status="error", stage="error", current=0, total=0, message=str(e))
+
+    finally:
+        if download_cancels.get(task_id) is cancel_event:
+            del download_cancels[task_id]
+
+    # Trim history as tasks finish so bursts of downloads stay bounded between sweeps
+    reap_finished_tasks()
 
 
 @prompt_server.routes.post("/hf_downloader/abort/{task_id}")
@@ -306,26 +597,64 @@ async def abort_download_handler(request):
         task_id = request.match_info["task_id"]
 
         if task_id not in download_tasks:
-            return web.json_response({"error": "Task not found"}, status=404)
+            return json_response({"error": "Task not found"}, status=404)
 
         task = download_tasks[task_id]
+        progress = download_progress.setdefault(task_id, {})
 
         if not task.done():
+            # Stays "cancelling" until the worker thread stops, which can outlast the wait below
+            progress["status"] = "cancelling"
+            if task_id in download_cancels:
+                download_cancels[task_id].set()
             task.cancel()
-            download_progress[task_id] = {
-                "status": "cancelled",
-                "stage": "cancelled",
-                "current": 0,
-                "total": 0,
-                "message": "Download cancelled by user",
-            }
+            # The startup coordinator is a concurrent.futures.Future from another thread
+            waiter = task if isinstance(task, asyncio.Future) else asyncio.wrap_future(task)
+            await asyncio.wait({waiter}, timeout=CANCEL_TIMEOUT)
+
+            if not task.done():
+                logger.warning(f"Download task {task_id} is still stopping")
+                return json_response(
+                    {"success": True, "status": "cancelling", "message": "Download is stopping"}
+                )
+
+            _mark_cancelled(progress)
             logger.info(f"Cancelled download task: {task_id}")
 
-        return web.json_response({"success": True, "message": "Download cancelled"})
+        return json_response(
+            {"success": True, "status": progress.get("status"), "message": "Download cancelled"}
+        )
 
     except Exception as e:
         logger.error(f"Error aborting download: {e}")
-        return web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
+
+
+def _list_model_files(model_dir: Path) -> list[dict]:
+    """Model files in model_dir, newest first"""
+    if not model_dir.exists():
+        return []
+
+    files = []
+    # scandir yields names straight from the directory read, so only
+    # model files cost a stat and no Path objects are built
+    with os.scandir(model_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(MODEL_FILE_SUFFIXES) or not entry.is_file():
+                continue
+            stat = entry.stat()
+            files.append(
+                {
+                    "name": entry.name,
+                    "size": stat.st_size,
+                    "modified": stat.st_mtime,
+                    "path": entry.path,
+                }
+            )
+
+    # Sort by modified time, newest first
+    files.sort(key=lambda x: x["modified"], reverse=True)
+    return files
 
 
 @prompt_server.routes.get("/hf_downloader/files/{model_type}")
@@ -339,30 +668,14 @@ async def list_files_handler(request):
         model_type = request.match_info["model_type"]
         model_dir = Path(get_model_dir(model_type))
 
-        if not model_dir.exists():
-            return web.json_response({"files": []})
-
-        files = []
-        for filepath in model_dir.iterdir():
-            if filepath.suffix in {".safetensors", ".gguf"}:
-                stat = filepath.stat()
-                files.append(
-                    {
-                        "name": filepath.name,
-                        "size": stat.st_size,
-                        "modified": stat.st_mtime,
-                        "path": str(filepath),
-                    }
-                )
-
-        # Sort by modified time, newest first
-        files.sort(key=lambda x: x["modified"], reverse=True)
+        # Large model folders take a while to stat, keep the event loop free meanwhile
+        files = await asyncio.to_thread(_list_model_files, model_dir)
 
-        return web.json_response({"files": files})
+        return json_response({"files": files})
 
     except Exception as e:
         logger.error(f"Error listing files: {e}")
-        return web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
 
 
 @prompt_server.routes.delete("/hf_downloader/files")
@@ -374,30 +687,31 @@ async def delete_file_handler(request):
     Body: { "filepath": "/path/to/file.safetensors" }
     """
     try:
-        data = await request.json()
+        data = await _read_json(request)
         filepath = data.get("filepath")
 
         if not filepath:
-            return web.json_response({"error": "filepath is required"}, status=400)
+            return json_response({"error": "filepath is required"}, status=400)
 
-        # Security: ensure file is in models directory
-        models_dir = Path(folder_paths.models_dir).resolve()
-        file_path = Path(filepath).resolve()
+        # Security: ensure file is in models directory, after following symlinks
+        # and "..", and without matching sibling folders like models_old/
+        models_dir = _resolved_dir(folder_paths.models_dir)
+        file_path = Path(os.path.realpath(filepath))
 
-        if not str(file_path).startswith(str(models_dir)):
-            return web.json_response({"error": "Invalid file path"}, status=403)
+        if not _is_within(models_dir, str(file_path)):
+            return json_response({"error": "Invalid file path"}, status=403)
 
         if not file_path.exists():
-            return web.json_response({"error": "File not found"}, status=404)
+            return json_response({"error": "File not found"}, status=404)
 
-        file_path.unlink()
+        await asyncio.to_thread(file_path.unlink)
         logger.info(f"Deleted file: {filepath}")
 
-        return web.json_response({"success": True, "message": "File deleted successfully"})
+        return json_response({"success": True, "message": "File deleted successfully"})
 
     except Exception as e:
         logger.error(f"Error deleting file: {e}")
-        return web.json_response({"error": str(e)}, status=500)
+        return json_response({"error": str(e)}, status=500)
 
 
 # Routes are registered via decorators when this module is imported
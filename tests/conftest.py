@@ -8,6 +8,10 @@ from pathlib import Path
 from typing import ClassVar
 from unittest.mock import Mock
 
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
 # Add parent directory to path so we can import modules
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -39,3 +43,19 @@ mock_server.PromptServer.instance = mock_prompt_server_instance
 # Install mocks at module level BEFORE any test imports
 sys.modules["folder_paths"] = MockFolderPaths()
 sys.modules["server"] = mock_server
+
+
+def build_app() -> web.Application:
+    """aiohttp app serving the extension routes, as ComfyUI's PromptServer would"""
+    import server_routes  # noqa: F401 - registers the routes on the mock prompt server
+
+    app = web.Application()
+    app.add_routes(mock_prompt_server_instance.routes)
+    return app
+
+
+@pytest.fixture
+async def client():
+    """In-process HTTP client for the extension routes"""
+    async with TestClient(TestServer(build_app())) as client:
+        yield client
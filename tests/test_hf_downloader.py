@@ -3,15 +3,85 @@ Comprehensive tests for HFDownloader class
 Tests cover split detection, precision extraction, name suggestion, and merge operations
 """
 
-import subprocess
-import tempfile
+import ctypes
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
 import pytest
 
+import hf_downloader
 from hf_downloader import HFDownloader
 
+pytestmark = pytest.mark.unit
+
+# torch is only needed to build safetensors fixtures; skip those tests without it
+try:
+    import torch
+    from safetensors import safe_open
+    from safetensors.torch import load_file, save_file
+except ImportError:
+    torch = None
+
+requires_torch = pytest.mark.skipif(torch is None, reason="torch not installed")
+
+# Stand-in for the entries list_repo_tree yields, only path and size are read
+FileInfo = namedtuple("FileInfo", ["path", "size"])
+
+SPLIT_PATTERN = r"-(\d+)-of-(\d+)\.safetensors$"
+SPLIT_FILES_3 = (
+    "base_model-00001-of-00003.safetensors",
+    "base_model-00002-of-00003.safetensors",
+    "base_model-00003-of-00003.safetensors",
+)
+
+PRECISION_CASES = (
+    ("model_fp16.safetensors", "fp16"),
+    ("model-fp32.safetensors", "fp32"),
+    ("model_bf16.safetensors", "bf16"),
+    ("model-fp8.safetensors", "fp8"),
+    ("model_int8.safetensors", "int8"),
+    ("model-int4.safetensors", "int4"),
+    ("model_bnb-4bit.safetensors", "bnb-4bit"),
+    ("model-bnb_8bit.safetensors", "bnb-8bit"),
+    ("model_fp8_e4m3fn.safetensors", "fp8-e4m3fn"),
+    ("model_nvfp4.safetensors", "nvfp4"),
+    ("model.safetensors", None),
+    ("model_v2.safetensors", None),
+)
+
+GGUF_QUANT_CASES = (
+    ("model.Q4_K_M.gguf", "Q4_K_M"),
+    ("model-q8_0.gguf", "Q8_0"),
+    ("model.F16.gguf", "F16"),
+    ("model-bf16.gguf", "BF16"),
+    ("model.gguf", None),
+    ("model_qwen.gguf", None),
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_scan_cache(tmp_path, monkeypatch):
+    """Keep cached scan results from leaking between tests (or into ~/.cache)"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    hf_downloader._scan_cache.clear()
+    hf_downloader._revision_cache.clear()
+    yield
+    hf_downloader._scan_cache.clear()
+    hf_downloader._revision_cache.clear()
+
+
+@pytest.fixture(scope="module")
+def downloader():
+    """One HFDownloader per module, tests only patch it temporarily"""
+    return HFDownloader()
+
 
 class TestHFDownloader:
     """Test suite for HFDownloader class"""
@@ -25,7 +95,7 @@ class TestHFDownloader:
     @pytest.fixture
     def downloader_no_token(self):
         """Create a HFDownloader instance without token"""
-        with patch.dict("os.environ", {}, clear=True):
+        with patch.dict("os.environ", {"HF_DL_FAST_TRANSFER": "1"}, clear=True):
             return HFDownloader()
 
     def test_init_with_token(self, downloader):
@@ -42,27 +112,7 @@ class TestHFDownloader:
 class TestPrecisionExtraction:
     """Test precision extraction from filenames"""
 
-    @pytest.fixture
-    def downloader(self):
-        return HFDownloader()
-
-    @pytest.mark.parametrize(
-        ("filename", "expected"),
-        [
-            ("model_fp16.safetensors", "fp16"),
-            ("model-fp32.safetensors", "fp32"),
-            ("model_bf16.safetensors", "bf16"),
-            ("model-fp8.safetensors", "fp8"),
-            ("model_int8.safetensors", "int8"),
-            ("model-int4.safetensors", "int4"),
-            ("model_bnb-4bit.safetensors", "bnb-4bit"),
-            ("model-bnb_8bit.safetensors", "bnb-8bit"),
-            ("model_fp8_e4m3fn.safetensors", "fp8-e4m3fn"),
-            ("model_nvfp4.safetensors", "nvfp4"),
-            ("model.safetensors", None),
-            ("model_v2.safetensors", None),
-        ],
-    )
+    @pytest.mark.parametrize(("filename", "expected"), PRECISION_CASES)
     def test_extract_precision(self, downloader, filename, expected):
         """Test precision extraction from various filename patterns"""
         result = downloader._extract_precision(filename)
@@ -73,481 +123,1157 @@ class TestPrecisionExtraction:
         assert downloader._extract_precision("model_FP16.safetensors") == "fp16"
         assert downloader._extract_precision("model-BF16.safetensors") == "bf16"
 
+    @pytest.mark.parametrize(
+        ("precisions", "expected"),
+        [
+            ([], None),
+            ([None, None], None),
+            (["fp16", None, "fp16"], "fp16"),
+            (["fp16", "bf16"], "mixed"),
+        ],
+    )
+    def test_compute_precision(self, precisions, expected):
+        """Test the shared precision of a group of files"""
+        files = [{"name": f"f{i}", "precision": p} for i, p in enumerate(precisions)]
+        assert hf_downloader._compute_precision(files, "precision") == expected
+
 
 class TestSplitDetection:
     """Test detection of split model files"""
 
-    @pytest.fixture
-    def downloader(self):
-        return HFDownloader()
-
-    def test_detect_split_files(self, downloader):
+    @pytest.mark.parametrize(
+        ("files", "expected_total"),
+        [
+            (list(SPLIT_FILES_3), 3),
+            (["model.safetensors", "vae.safetensors"], None),
+            (["model.safetensors"], None),
+            # Mixed split and non-split files take the pattern from the shards
+            (
+                [
+                    "model-00001-of-00002.safetensors",
+                    "model-00002-of-00002.safetensors",
+                    "vae.safetensors",
+                ],
+                2,
+            ),
+        ],
+        ids=["split", "no-splits", "single-file", "mixed"],
+    )
+    def test_detect_splits(self, downloader, files, expected_total):
         """Test detection of split pattern in filenames"""
-        files = [
-            "model-00001-of-00003.safetensors",
-            "model-00002-of-00003.safetensors",
-            "model-00003-of-00003.safetensors",
-        ]
         result = downloader._detect_splits(files)
-        assert result is not None
-        assert result["total"] == 3
-        assert "pattern" in result
-
-    def test_detect_no_splits(self, downloader):
-        """Test that non-split files return None"""
-        files = ["model.safetensors", "vae.safetensors"]
-        result = downloader._detect_splits(files)
-        assert result is None
-
-    def test_detect_single_file(self, downloader):
-        """Test single file returns None"""
-        files = ["model.safetensors"]
-        result = downloader._detect_splits(files)
-        assert result is None
-
-    def test_detect_mixed_files(self, downloader):
-        """Test detection with mixed split and non-split files"""
-        files = [
-            "model-00001-of-00002.safetensors",
-            "model-00002-of-00002.safetensors",
-            "vae.safetensors",
-        ]
-        # Should detect the split pattern from first file
-        result = downloader._detect_splits(files)
-        assert result is not None
-        assert result["total"] == 2
+        if expected_total is None:
+            assert result is None
+        else:
+            assert result["total"] == expected_total
+            assert "pattern" in result
 
 
 class TestNameSuggestion:
     """Test filename suggestion logic"""
 
-    @pytest.fixture
-    def downloader(self):
-        return HFDownloader()
-
-    def test_suggest_name_root_single_file(self, downloader):
-        """Test name suggestion for single file in root"""
-        files = ["model_fp16.safetensors"]
-        result = downloader._suggest_name("user/repo", "root", files, None)
-        assert result == "model_fp16"
-
-    def test_suggest_name_split_files(self, downloader):
-        """Test name suggestion for split files"""
-        files = [
-            "base_model-00001-of-00003.safetensors",
-            "base_model-00002-of-00003.safetensors",
-            "base_model-00003-of-00003.safetensors",
-        ]
-        split_info = {"total": 3, "pattern": r"-(\d+)-of-(\d+)\.safetensors$"}
-        result = downloader._suggest_name("user/repo", "root", files, split_info)
-        assert result == "base_model"
-
-    def test_suggest_name_folder(self, downloader):
-        """Test name suggestion for files in a folder"""
-        files = ["model.safetensors"]
-        with patch.object(downloader, "_get_name_from_config", return_value=None):
-            result = downloader._suggest_name("user/repo", "models/v1", files, None)
-            assert result == "v1"
-
-    def test_suggest_name_fallback_to_repo(self, downloader):
-        """Test fallback to repo name"""
-        files = ["model.safetensors"]
-        result = downloader._suggest_name("user/awesome-model", "root", files, None)
-        # For root with single file, should use filename
-        assert result == "model"
-
-    def test_suggest_name_with_config(self, downloader):
-        """Test name suggestion using config.json"""
-        files = ["model.safetensors"]
-        with patch.object(downloader, "_get_name_from_config", return_value="custom_name"):
-            result = downloader._suggest_name("user/repo", "models/v1", files, None)
-            assert result == "custom_name"
+    @pytest.mark.parametrize(
+        ("repo_id", "folder", "files", "split_info", "config_name", "expected"),
+        [
+            ("user/repo", "root", ["model_fp16.safetensors"], None, None, "model_fp16"),
+            (
+                "user/repo",
+                "root",
+                list(SPLIT_FILES_3),
+                {"total": 3, "pattern": SPLIT_PATTERN},
+                None,
+                "base_model",
+            ),
+            ("user/repo", "models/v1", ["model.safetensors"], None, None, "v1"),
+            # For root with single file, the filename wins over the repo name
+            ("user/awesome-model", "root", ["model.safetensors"], None, None, "model"),
+            ("user/repo", "models/v1", ["model.safetensors"], None, "custom_name", "custom_name"),
+        ],
+        ids=["root-single-file", "split-files", "folder", "fallback-to-file", "config"],
+    )
+    def test_suggest_name(
+        self, downloader, repo_id, folder, files, split_info, config_name, expected
+    ):
+        """Test name suggestion from files, folder and config.json"""
+        with patch.object(downloader, "_get_name_from_config", return_value=config_name):
+            assert downloader._suggest_name(repo_id, folder, files, split_info) == expected
 
 
 class TestConfigParsing:
     """Test config.json parsing for model names"""
 
-    @pytest.fixture
-    def downloader(self):
-        return HFDownloader()
+    @pytest.fixture(autouse=True)
+    def clear_config_cache(self):
+        hf_downloader._fetch_config.cache_clear()
+        yield
+        hf_downloader._fetch_config.cache_clear()
+
+    @staticmethod
+    def _session(config):
+        session = Mock()
+        session.get.return_value.json.return_value = config
+        return session
 
-    def test_get_name_from_config_name_or_path(self, downloader):
+    def test_get_name_from_config_name_or_path(self, downloader, monkeypatch):
         """Test extracting name from _name_or_path field"""
-        import json
-        from io import StringIO
+        session = self._session({"_name_or_path": "google/t5-v1_1-xxl", "model_type": "t5"})
 
-        mock_config = {"_name_or_path": "google/t5-v1_1-xxl", "model_type": "t5"}
-        mock_file_content = StringIO(json.dumps(mock_config))
+        monkeypatch.setattr(hf_downloader, "get_session", lambda: session)
+        result = downloader._get_name_from_config("user/repo", "folder")
+        assert result == "t5-v1_1-xxl"
 
-        with (
-            patch("hf_downloader.hf_hub_download", return_value="/tmp/config.json"),
-            patch("pathlib.Path.open", return_value=mock_file_content),
-        ):
-            result = downloader._get_name_from_config("user/repo", "folder")
-            assert result == "t5-v1_1-xxl"
+        url = session.get.call_args.args[0]
+        assert url.endswith("/user/repo/resolve/main/folder/config.json")
 
-    def test_get_name_from_config_model_type_fallback(self, downloader):
+    def test_get_name_from_config_model_type_fallback(self, downloader, monkeypatch):
         """Test fallback to model_type when _name_or_path is absent"""
-        import json
-        from io import StringIO
+        session = self._session({"model_type": "bert"})
 
-        mock_config = {"model_type": "bert"}
-        mock_file_content = StringIO(json.dumps(mock_config))
+        monkeypatch.setattr(hf_downloader, "get_session", lambda: session)
+        result = downloader._get_name_from_config("user/repo", "folder")
+        assert result == "bert"
 
-        with (
-            patch("hf_downloader.hf_hub_download", return_value="/tmp/config.json"),
-            patch("pathlib.Path.open", return_value=mock_file_content),
-        ):
-            result = downloader._get_name_from_config("user/repo", "folder")
-            assert result == "bert"
+    def test_get_name_from_config_cached(self, downloader, monkeypatch):
+        """Test that config.json is fetched once per repo folder"""
+        session = self._session({"model_type": "bert"})
 
-    def test_get_name_from_config_not_found(self, downloader):
-        """Test when config.json cannot be found"""
-        with patch("hf_downloader.hf_hub_download", side_effect=Exception("File not found")):
-            result = downloader._get_name_from_config("user/repo", "folder")
-            assert result is None
+        monkeypatch.setattr(hf_downloader, "get_session", lambda: session)
+        assert downloader._get_name_from_config("user/repo", "folder") == "bert"
+        assert downloader._get_name_from_config("user/repo", "folder") == "bert"
 
+        assert session.get.call_count == 1
 
-class TestScanRepo:
-    """Test repository scanning functionality"""
+    def test_get_name_from_config_not_found(self, downloader, monkeypatch):
+        """Test that a missing config.json is remembered"""
+        session = Mock()
+        session.get.return_value.status_code = 404
 
-    @pytest.fixture
-    def downloader(self):
-        return HFDownloader()
-
-    def test_scan_repo_basic(self, downloader):
-        """Test basic repo scanning with mock data"""
-        # Create mock file info objects
-        mock_files = [
-            Mock(rfilename="model.safetensors", size=1000000),
-            Mock(rfilename="vae/vae_fp16.safetensors", size=500000),
-        ]
+        monkeypatch.setattr(hf_downloader, "get_session", lambda: session)
+        assert downloader._get_name_from_config("user/repo", "folder") is None
+        assert downloader._get_name_from_config("user/repo", "folder") is None
 
-        # Mock the api.list_files_info method
-        downloader.api.list_files_info = Mock(return_value=mock_files)
+        assert session.get.call_count == 1
 
-        result = downloader.scan_repo("user/test-repo")
+    def test_get_name_from_config_error_not_cached(self, downloader, monkeypatch):
+        """Test that a failed request is retried on the next scan"""
+        session = Mock()
+        session.get.return_value.raise_for_status.side_effect = Exception("503 Unavailable")
 
-        assert len(result) == 2
-        # Check root model
-        assert any(item["path"] == "root" for item in result)
-        # Check vae folder
-        assert any(item["path"] == "vae" for item in result)
-
-    def test_scan_repo_split_files(self, downloader):
-        """Test repo scanning with split files"""
-        mock_files = [
-            Mock(rfilename="model/file-00001-of-00003.safetensors", size=1000000),
-            Mock(rfilename="model/file-00002-of-00003.safetensors", size=1000000),
-            Mock(rfilename="model/file-00003-of-00003.safetensors", size=1000000),
-        ]
+        monkeypatch.setattr(hf_downloader, "get_session", lambda: session)
+        assert downloader._get_name_from_config("user/repo", "folder") is None
+        assert downloader._get_name_from_config("user/repo", "folder") is None
 
-        downloader.api.list_files_info = Mock(return_value=mock_files)
+        assert session.get.call_count == 2
 
-        result = downloader.scan_repo("user/test-repo")
 
-        assert len(result) == 1
-        assert result[0]["is_split"] is True
-        assert result[0]["file_count"] == 3
-        assert result[0]["total_size"] == 3000000
+class FakeApi:
+    """HfApi stand-in serving a fixed repo listing at one commit"""
 
-    def test_scan_repo_multiple_root_files(self, downloader):
-        """Test that multiple root files are treated as separate entries"""
-        mock_files = [
-            Mock(rfilename="model1.safetensors", size=1000000),
-            Mock(rfilename="model2.safetensors", size=2000000),
-        ]
+    def __init__(self, files, sha="abc123"):
+        self.files = files
+        self.sha = sha
 
-        downloader.api.list_files_info = Mock(return_value=mock_files)
+    def list_repo_tree(self, repo_id, **kwargs):
+        return iter(self.files)
 
-        result = downloader.scan_repo("user/test-repo")
+    def repo_info(self, repo_id, **kwargs):
+        return SimpleNamespace(sha=self.sha)
 
-        # Should have 2 separate entries for root files
-        assert len(result) == 2
-        assert all(item["path"] == "root" for item in result)
-        assert all(item["file_count"] == 1 for item in result)
-
-    def test_scan_repo_subfolder_variants_grouped(self, downloader):
-        """Test that non-split variants in the same folder are grouped by base name"""
-        mock_files = [
-            Mock(rfilename="models/qwen_image_bf16.safetensors", size=1000000),
-            Mock(rfilename="models/qwen_image_fp8_e4m3fn.safetensors", size=2000000),
-            Mock(rfilename="models/other.safetensors", size=3000000),
-        ]
 
-        downloader.api.list_files_info = Mock(return_value=mock_files)
+def _check_basic(result):
+    assert len(result) == 2
+    assert any(item["path"] == "root" for item in result)
+    assert any(item["path"] == "vae" for item in result)
 
-        result = downloader.scan_repo("user/test-repo")
 
-        assert len(result) == 2
-        qwen_group = next(item for item in result if item.get("base_name") == "qwen_image")
-        assert qwen_group["file_count"] == 2
-        assert qwen_group["is_split"] is False
-        assert qwen_group["suggested_name"] == "qwen_image"
-        assert {f["name"] for f in qwen_group["files"]} == {
-            "qwen_image_bf16.safetensors",
-            "qwen_image_fp8_e4m3fn.safetensors",
-        }
-        other_group = next(item for item in result if item.get("base_name") == "other")
-        assert other_group["file_count"] == 1
-        assert other_group["total_size"] == 3000000
+def _check_split_files(result):
+    assert len(result) == 1
+    assert result[0]["is_split"] is True
+    assert result[0]["file_count"] == 3
+    assert result[0]["total_size"] == 3000000
+
+
+def _check_multiple_root_files(result):
+    # Root files are separate entries rather than one group
+    assert len(result) == 2
+    assert all(item["path"] == "root" for item in result)
+    assert all(item["file_count"] == 1 for item in result)
+
+
+def _check_subfolder_variants_grouped(result):
+    # Non-split variants in the same folder are grouped by base name
+    assert len(result) == 2
+    qwen_group = next(item for item in result if item.get("base_name") == "qwen_image")
+    assert qwen_group["file_count"] == 2
+    assert qwen_group["is_split"] is False
+    assert qwen_group["suggested_name"] == "qwen_image"
+    assert {f["name"] for f in qwen_group["files"]} == {
+        "qwen_image_bf16.safetensors",
+        "qwen_image_fp8_e4m3fn.safetensors",
+    }
+    other_group = next(item for item in result if item.get("base_name") == "other")
+    assert other_group["file_count"] == 1
+    assert other_group["total_size"] == 3000000
+
+
+def _check_gguf_variants(result):
+    gguf_entries = [item for item in result if item.get("file_type") == "gguf"]
+    assert len(gguf_entries) == 2
+    model_entry = next(item for item in gguf_entries if item.get("base_name") == "model")
+    assert model_entry["file_count"] == 2
+    assert set(model_entry["quant_options"]) == {"Q4_K_M", "Q5_K_M"}
+
+
+class TestScanRepo:
+    """Test repository scanning functionality"""
+
+    @pytest.fixture
+    def downloader(self, downloader, monkeypatch):
+        # Tests replace these API methods directly, monkeypatch restores them afterwards
+        monkeypatch.setattr(downloader.api, "repo_info", Mock(return_value=Mock(sha="abc123")))
+        monkeypatch.setattr(downloader.api, "list_repo_tree", Mock())
+        monkeypatch.setattr(downloader.api, "list_repo_files", Mock())
+        return downloader
+
+    @pytest.mark.parametrize(
+        ("files", "check"),
+        [
+            (
+                [
+                    FileInfo(path="model.safetensors", size=1000000),
+                    FileInfo(path="vae/vae_fp16.safetensors", size=500000),
+                ],
+                _check_basic,
+            ),
+            (
+                [
+                    FileInfo(path=f"model/file-0000{i}-of-00003.safetensors", size=1000000)
+                    for i in (1, 2, 3)
+                ],
+                _check_split_files,
+            ),
+            (
+                [
+                    FileInfo(path="model1.safetensors", size=1000000),
+                    FileInfo(path="model2.safetensors", size=2000000),
+                ],
+                _check_multiple_root_files,
+            ),
+            (
+                [
+                    FileInfo(path="models/qwen_image_bf16.safetensors", size=1000000),
+                    FileInfo(path="models/qwen_image_fp8_e4m3fn.safetensors", size=2000000),
+                    FileInfo(path="models/other.safetensors", size=3000000),
+                ],
+                _check_subfolder_variants_grouped,
+            ),
+            (
+                [
+                    FileInfo(path="llm/model.Q4_K_M.gguf", size=1000000),
+                    FileInfo(path="llm/model.Q5_K_M.gguf", size=2000000),
+                    FileInfo(path="llm/other.gguf", size=500000),
+                ],
+                _check_gguf_variants,
+            ),
+        ],
+        ids=["basic", "split-files", "multiple-root-files", "subfolder-variants", "gguf-variants"],
+    )
+    def test_scan_repo_groups_files(self, downloader, monkeypatch, files, check):
+        """Test how a repo listing is grouped into model entries"""
+        monkeypatch.setattr(downloader, "api", FakeApi(files))
+        check(downloader.scan_repo("user/test-repo"))
+
+    @pytest.mark.parametrize(
+        ("path", "expected"),
+        [
+            # A single file's trailing variant is its precision, even with earlier tokens
+            ("v2-BF16-FP16.safetensors", "fp16"),
+            ("of_of_int8-bf16.safetensors", "bf16"),
+            # Without a variant suffix the first precision token anywhere is used
+            ("model_fp16.distilled.safetensors", "fp16"),
+            # Shards keep the first precision token anywhere in the name
+            ("v2-bf16-fp16-00001-of-00002.safetensors", "bf16"),
+        ],
+    )
+    def test_scan_repo_precision_rule(self, downloader, monkeypatch, path, expected):
+        """Test which of several precision tokens in a filename is reported"""
+        monkeypatch.setattr(downloader, "api", FakeApi([FileInfo(path=path, size=1)]))
+        (entry,) = downloader.scan_repo("user/test-repo")
+        assert entry["files"][0]["precision"] == expected
 
     def test_scan_repo_error_handling(self, downloader):
         """Test error handling in repo scanning"""
-        downloader.api.list_files_info = Mock(side_effect=Exception("API Error"))
+        downloader.api.list_repo_tree = Mock(side_effect=Exception("API Error"))
 
         with pytest.raises(Exception, match="API Error"):
             downloader.scan_repo("user/test-repo")
 
-    def test_scan_repo_gguf_variants(self, downloader):
-        """Test repo scanning with GGUF quant variants"""
-        mock_files = [
-            Mock(rfilename="llm/model.Q4_K_M.gguf", size=1000000),
-            Mock(rfilename="llm/model.Q5_K_M.gguf", size=2000000),
-            Mock(rfilename="llm/other.gguf", size=500000),
+    def test_scan_repo_cached_per_revision(self, downloader):
+        """Test that rescans of an unchanged repo reuse the cached result"""
+        downloader.api.list_repo_tree = Mock(
+            return_value=[FileInfo(path="model.safetensors", size=1000000)]
+        )
+
+        first = downloader.scan_repo("user/test-repo")
+        first[0]["suggested_name"] = "mutated"
+        second = downloader.scan_repo("user/test-repo")
+
+        assert downloader.api.list_repo_tree.call_count == 1
+        assert second[0]["suggested_name"] == "model"
+
+        downloader.scan_repo("user/test-repo", force_refresh=True)
+        assert downloader.api.list_repo_tree.call_count == 2
+
+        # A new commit is picked up once the cached sha expires
+        downloader.api.repo_info.return_value = Mock(sha="def456")
+        later = time.monotonic() + hf_downloader.REVISION_TTL + 1
+        with patch("hf_downloader.time.monotonic", return_value=later):
+            downloader.scan_repo("user/test-repo")
+        assert downloader.api.list_repo_tree.call_count == 3
+
+    def test_repo_revision_cached_for_ttl(self, downloader):
+        """Test that rescans within the TTL skip the sha lookup"""
+        downloader.api.list_repo_tree = Mock(return_value=[])
+
+        downloader.scan_repo("user/test-repo")
+        downloader.scan_repo("user/test-repo")
+        assert downloader.api.repo_info.call_count == 1
+
+        downloader.scan_repo("user/test-repo", force_refresh=True)
+        assert downloader.api.repo_info.call_count == 2
+
+    def test_repo_revision_concurrent_pruning(self, downloader, monkeypatch):
+        """Test that threads resolving many repos at once can prune the sha cache safely"""
+        monkeypatch.setattr(hf_downloader, "REVISION_TTL", 0)
+        monkeypatch.setattr(downloader, "api", FakeApi([]))
+
+        def resolve(worker):
+            return [downloader._repo_revision(f"user/repo-{worker}-{i}") for i in range(200)]
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(resolve, range(16)))
+
+        assert all(sha == "abc123" for shas in results for sha in shas)
+        assert len(hf_downloader._revision_cache) <= hf_downloader.SCAN_CACHE_SIZE + 16
+
+    def test_list_repo_files_info_keeps_model_files_only(self, downloader):
+        """Test that the tree listing keeps only model files and config.json"""
+        downloader.api.list_repo_tree = Mock(
+            return_value=iter(
+                [
+                    Mock(type="folder", path="vae"),
+                    Mock(type="file", path="README.md", size=10),
+                    Mock(type="file", path="vae/config.json", size=10),
+                    Mock(type="file", path="vae/scheduler_config.json", size=10),
+                    Mock(type="file", path="vae/vae.safetensors", size=None),
+                    Mock(type="file", path="model.Q4_K_M.gguf", size=20),
+                ]
+            )
+        )
+
+        files = list(downloader._list_repo_files_info("user/test-repo"))
+
+        assert [(f.rfilename, f.size) for f in files] == [
+            ("vae/config.json", 10),
+            ("vae/vae.safetensors", 0),
+            ("model.Q4_K_M.gguf", 20),
         ]
 
-        downloader.api.list_files_info = Mock(return_value=mock_files)
+    def test_scan_repo_skips_folders_without_config(self, downloader):
+        """Test that config.json is only requested where the listing has one"""
+        downloader.api.list_repo_tree = Mock(
+            return_value=[
+                FileInfo(path=f"unet/model-0000{i}-of-00002.safetensors", size=1000) for i in (1, 2)
+            ]
+        )
+
+        with patch.object(downloader, "_get_name_from_config") as get_name:
+            result = downloader.scan_repo("user/test-repo")
+
+        get_name.assert_not_called()
+        assert result[0]["suggested_name"] == "model"
+
+    def test_scan_repo_persists_to_disk(self, downloader):
+        """Test that a scan survives losing the in-memory cache"""
+        downloader.api.list_repo_tree = Mock(
+            return_value=[FileInfo(path="model.safetensors", size=1000000)]
+        )
+
+        first = downloader.scan_repo("user/test-repo")
+        hf_downloader._scan_cache.clear()
+        second = downloader.scan_repo("user/test-repo")
+
+        assert downloader.api.list_repo_tree.call_count == 1
+        assert second == first
+        assert hf_downloader._scan_file("user/test-repo", "abc123", True).exists()
+
+    def test_scan_cache_prunes_old_revisions(self, downloader):
+        """Test that a new revision replaces the repo's older cached scans on disk"""
+        downloader.api.list_repo_tree = Mock(
+            return_value=[FileInfo(path="model.safetensors", size=1000000)]
+        )
+        old_full = hf_downloader._scan_file("user/test-repo", "old", True)
+        old_names = hf_downloader._scan_file("user/test-repo", "old", False)
+        other_repo = hf_downloader._scan_file("user/other-repo", "old", True)
+        old_full.parent.mkdir(parents=True)
+        for path in (old_full, old_names, other_repo):
+            path.write_text("[]")
+
+        downloader.scan_repo("user/test-repo")
+
+        assert hf_downloader._scan_file("user/test-repo", "abc123", True).exists()
+        assert not old_full.exists()
+        assert not old_names.exists()
+        assert other_repo.exists()
+
+    def test_scan_cache_bounded_on_disk(self, monkeypatch):
+        """Test that the oldest scan files are dropped beyond the disk cap"""
+        monkeypatch.setattr(hf_downloader, "SCAN_DISK_CACHE_SIZE", 3)
+        paths = [hf_downloader._scan_file(f"user/repo-{i}", "abc123", True) for i in range(5)]
+        for i, path in enumerate(paths):
+            hf_downloader._write_scan_file(path, [])
+            os.utime(path, (i, i))
+        hf_downloader._write_scan_file(paths[0], [])
+
+        remaining = sorted(p.name for p in paths[0].parent.iterdir())
+        assert remaining == sorted(p.name for p in (paths[0], paths[3], paths[4]))
+
+    def test_scan_repo_ignores_corrupt_disk_cache(self, downloader):
+        """Test that an unreadable cache file just triggers a rescan"""
+        downloader.api.list_repo_tree = Mock(
+            return_value=[FileInfo(path="model.safetensors", size=1000000)]
+        )
+        cache_file = hf_downloader._scan_file("user/test-repo", "abc123", True)
+        cache_file.parent.mkdir(parents=True)
+        cache_file.write_text("{not json")
 
         result = downloader.scan_repo("user/test-repo")
-        gguf_entries = [item for item in result if item.get("file_type") == "gguf"]
 
-        assert len(gguf_entries) == 2
-        model_entry = next(item for item in gguf_entries if item.get("base_name") == "model")
-        assert model_entry["file_count"] == 2
-        assert set(model_entry["quant_options"]) == {"Q4_K_M", "Q5_K_M"}
+        assert result[0]["suggested_name"] == "model"
+        assert downloader.api.list_repo_tree.call_count == 1
+
+    def test_scan_repo_without_sizes(self, downloader):
+        """Test that a names-only scan skips the tree listing"""
+        downloader.api.list_repo_tree = Mock()
+        downloader.api.list_repo_files = Mock(
+            return_value=["model.safetensors", "vae/vae.safetensors", "README.md"]
+        )
+
+        result = downloader.scan_repo("user/test-repo", include_sizes=False)
+
+        downloader.api.list_repo_tree.assert_not_called()
+        assert {item["path"] for item in result} == {"root", "vae"}
+        assert all(item["total_size"] == 0 for item in result)
+
+    def test_scan_repo_without_sizes_reuses_full_scan(self, downloader):
+        """Test that a cached full scan answers a names-only request"""
+        downloader.api.list_repo_tree = Mock(
+            return_value=[FileInfo(path="model.safetensors", size=1000000)]
+        )
+        downloader.api.list_repo_files = Mock()
+
+        downloader.scan_repo("user/test-repo")
+        result = downloader.scan_repo("user/test-repo", include_sizes=False)
+
+        downloader.api.list_repo_files.assert_not_called()
+        assert result[0]["total_size"] == 1000000
+
+    def test_scan_repos_collects_results_and_errors(self, downloader):
+        """Test scanning several repos at once"""
+
+        def list_files(repo_id, **kwargs):
+            if repo_id == "user/missing":
+                raise Exception("Repository not found")
+            return [FileInfo(path=f"{repo_id.split('/')[1]}.safetensors", size=10)]
+
+        downloader.api.list_repo_tree = Mock(side_effect=list_files)
+
+        results = downloader.scan_repos(["user/a", "user/b", "user/missing"])
+
+        assert results["user/a"][0]["suggested_name"] == "a"
+        assert results["user/b"][0]["suggested_name"] == "b"
+        assert isinstance(results["user/missing"], Exception)
+
+    def test_scan_repo_fetches_configs_once_per_folder(self, downloader):
+        """Test that config.json names are prefetched once per split folder"""
+        downloader.api.list_repo_tree = Mock(
+            return_value=[
+                FileInfo(path=f"{folder}/model-0000{i}-of-00002.safetensors", size=1000)
+                for folder in ("text_encoder", "transformer")
+                for i in (1, 2)
+            ]
+            + [
+                FileInfo(path="text_encoder/config.json", size=10),
+                FileInfo(path="transformer/config.json", size=10),
+            ]
+        )
+
+        with patch.object(
+            downloader, "_get_name_from_config", side_effect=lambda repo, folder: f"{folder}_cfg"
+        ) as get_name:
+            result = downloader.scan_repo("user/test-repo")
+
+        assert {item["suggested_name"] for item in result} == {
+            "text_encoder_cfg",
+            "transformer_cfg",
+        }
+        assert sorted(call.args[1] for call in get_name.call_args_list) == [
+            "text_encoder",
+            "transformer",
+        ]
 
 
 class TestGGUFQuantExtraction:
     """Test GGUF quant extraction from filenames"""
 
-    @pytest.fixture
-    def downloader(self):
-        return HFDownloader()
-
-    @pytest.mark.parametrize(
-        ("filename", "expected"),
-        [
-            ("model.Q4_K_M.gguf", "Q4_K_M"),
-            ("model-q8_0.gguf", "Q8_0"),
-            ("model.F16.gguf", "F16"),
-            ("model-bf16.gguf", "BF16"),
-            ("model.gguf", None),
-            ("model_qwen.gguf", None),
-        ],
-    )
+    @pytest.mark.parametrize(("filename", "expected"), GGUF_QUANT_CASES)
     def test_extract_gguf_quant(self, downloader, filename, expected):
         """Test quant extraction for common GGUF patterns"""
         assert downloader._extract_gguf_quant(filename) == expected
 
 
-class TestHFCLIOperations:
-    """Test HuggingFace CLI operations"""
+@pytest.mark.parametrize(
+    ("env", "expected"),
+    [
+        ({}, 8),
+        ({"HF_PARALLEL_DOWNLOADING_WORKERS": "3"}, 3),
+        ({"HF_DL_WORKERS": "2"}, 2),
+        ({"HF_PARALLEL_DOWNLOADING_WORKERS": "0"}, 1),
+        ({"HF_PARALLEL_DOWNLOADING_WORKERS": "many"}, 8),
+    ],
+)
+def test_download_workers(env, expected):
+    """Test the download worker count read from the environment"""
+    with patch.dict("os.environ", env, clear=True):
+        assert hf_downloader._download_workers() == expected
+
+
+def test_get_downloader_is_shared(monkeypatch):
+    """Test that the routes reuse a single downloader instance"""
+    monkeypatch.setattr(hf_downloader, "_default_downloader", None)
+    first = hf_downloader.get_downloader()
+    assert isinstance(first, HFDownloader)
+    assert hf_downloader.get_downloader() is first
+
+
+class TestEnableHfTransfer:
+    """Test selection of the multi-connection downloader"""
 
     @pytest.fixture
-    def downloader(self):
-        return HFDownloader()
-
-    def test_check_hf_cli_installed(self, downloader):
-        """Test HF CLI availability check when installed"""
-        with patch("subprocess.run") as mock_run:
-            mock_run.return_value = Mock(returncode=0)
-            result = downloader._check_hf_cli()
-            assert result is True
-
-    def test_check_hf_cli_not_installed(self, downloader):
-        """Test HF CLI availability check when not installed"""
-        with patch("subprocess.run", side_effect=FileNotFoundError):
-            result = downloader._check_hf_cli()
-            assert result is False
-
-    def test_hf_login_success(self, downloader):
-        """Test successful HF login"""
-        with patch("subprocess.run") as mock_run:
-            mock_run.return_value = Mock(returncode=0)
-            downloader._hf_login()  # Should not raise
-
-    def test_hf_login_failure_nonfatal(self, downloader):
-        """Test that HF login failure is non-fatal"""
-        with patch(
-            "subprocess.run",
-            side_effect=subprocess.CalledProcessError(1, "hf", stderr="Error"),
+    def constants(self, monkeypatch):
+        fake = SimpleNamespace()
+        monkeypatch.setattr(hf_downloader, "constants", fake)
+        return fake
+
+    def test_xet_high_performance(self, constants):
+        """Test that Xet-based releases get high performance mode"""
+        with patch.dict("os.environ", {"HF_DL_FAST_TRANSFER": "1"}, clear=True):
+            hf_downloader._enable_hf_transfer()
+            assert os.environ["HF_XET_HIGH_PERFORMANCE"] == "1"
+        assert constants.HF_XET_HIGH_PERFORMANCE is True
+
+    def test_hf_transfer_enabled_when_installed(self, constants):
+        """Test that hf_transfer is switched on when it can be imported"""
+        constants.HF_HUB_ENABLE_HF_TRANSFER = False
+        with (
+            patch.dict("os.environ", {"HF_DL_FAST_TRANSFER": "1"}, clear=True),
+            patch("hf_downloader.importlib.util.find_spec", return_value=Mock()),
+        ):
+            hf_downloader._enable_hf_transfer()
+            assert os.environ["HF_HUB_ENABLE_HF_TRANSFER"] == "1"
+        assert constants.HF_HUB_ENABLE_HF_TRANSFER is True
+
+    def test_hf_transfer_missing_warns(self, constants, caplog):
+        """Test that a missing hf_transfer is reported and left disabled"""
+        constants.HF_HUB_ENABLE_HF_TRANSFER = False
+        with (
+            patch.dict("os.environ", {"HF_DL_FAST_TRANSFER": "1"}, clear=True),
+            patch("hf_downloader.importlib.util.find_spec", return_value=None),
         ):
-            # Should not raise, just log warning
-            downloader._hf_login()
+            hf_downloader._enable_hf_transfer()
+            assert "HF_HUB_ENABLE_HF_TRANSFER" not in os.environ
+        assert constants.HF_HUB_ENABLE_HF_TRANSFER is False
+        assert "pip install hf_transfer" in caplog.text
+
+    @pytest.mark.parametrize("env", [{}, {"HF_DL_FAST_TRANSFER": "0"}])
+    def test_disabled_by_default(self, constants, env):
+        """Test that hub settings are left alone unless fast transfer is opted into"""
+        constants.HF_HUB_ENABLE_HF_TRANSFER = False
+        with (
+            patch.dict("os.environ", env, clear=True),
+            patch("hf_downloader.importlib.util.find_spec", return_value=Mock()),
+        ):
+            hf_downloader._enable_hf_transfer()
+            assert "HF_HUB_ENABLE_HF_TRANSFER" not in os.environ
+            assert "HF_XET_HIGH_PERFORMANCE" not in os.environ
+        assert constants.HF_HUB_ENABLE_HF_TRANSFER is False
+
+    @pytest.mark.parametrize("name", ["HF_XET_HIGH_PERFORMANCE", "HF_HUB_ENABLE_HF_TRANSFER"])
+    def test_user_setting_wins(self, constants, name):
+        """Test that an explicit environment value is never overwritten"""
+        if name == "HF_HUB_ENABLE_HF_TRANSFER":
+            constants.HF_HUB_ENABLE_HF_TRANSFER = False
+        with (
+            patch.dict("os.environ", {"HF_DL_FAST_TRANSFER": "1", name: "0"}, clear=True),
+            patch("hf_downloader.importlib.util.find_spec", return_value=Mock()),
+        ):
+            hf_downloader._enable_hf_transfer()
+            assert os.environ[name] == "0"
+        assert getattr(constants, name, False) is False
+
+
+class TestDownloadFile:
+    """Test single file downloads through the HuggingFace Hub API"""
 
     def test_download_file_success(self, downloader):
         """Test successful file download"""
-        with patch("subprocess.run") as mock_run:
-            mock_run.return_value = Mock(returncode=0, stdout="/cache/path/model.safetensors")
+        with patch(
+            "hf_downloader.hf_hub_download", return_value="/cache/path/model.safetensors"
+        ) as mock_download:
             result = downloader._download_file("user/repo", "model.safetensors")
             assert result == "/cache/path/model.safetensors"
+            assert mock_download.call_args.kwargs["filename"] == "model.safetensors"
+            assert mock_download.call_args.kwargs["library_name"] == "comfyui-hf-downloader"
+
+    def test_download_file_uses_cache_for_revision(self, downloader):
+        """Test that a file cached at the pinned commit is returned without downloading"""
+        with (
+            patch(
+                "hf_downloader.try_to_load_from_cache", return_value="/cache/model.safetensors"
+            ) as mock_cache,
+            patch("hf_downloader.hf_hub_download") as mock_download,
+        ):
+            result = downloader._download_file("user/repo", "model.safetensors", revision="abc123")
+
+        assert result == "/cache/model.safetensors"
+        mock_cache.assert_called_once_with("user/repo", "model.safetensors", revision="abc123")
+        mock_download.assert_not_called()
+
+    def test_download_file_cache_miss_downloads_revision(self, downloader):
+        """Test that a cache miss downloads the file at the pinned commit"""
+        with (
+            patch("hf_downloader.try_to_load_from_cache", return_value=None),
+            patch(
+                "hf_downloader.hf_hub_download", return_value="/cache/model.safetensors"
+            ) as mock_download,
+        ):
+            downloader._download_file("user/repo", "model.safetensors", revision="abc123")
+
+        assert mock_download.call_args.kwargs["revision"] == "abc123"
+
+    def test_download_concurrency_bounded(self, downloader, monkeypatch):
+        """Test that concurrent downloads never exceed the process-wide slot count"""
+        monkeypatch.setattr(hf_downloader, "_download_slots", threading.BoundedSemaphore(8))
+        lock = threading.Lock()
+        counts = {"in_flight": 0, "max_in_flight": 0}
+
+        def fake_download(**kwargs):
+            with lock:
+                counts["in_flight"] += 1
+                counts["max_in_flight"] = max(counts["max_in_flight"], counts["in_flight"])
+            time.sleep(0.01)
+            with lock:
+                counts["in_flight"] -= 1
+            return f"/cache/{kwargs['filename']}"
+
+        with (
+            patch("hf_downloader.hf_hub_download", side_effect=fake_download),
+            ThreadPoolExecutor(max_workers=32) as pool,
+        ):
+            results = list(
+                pool.map(
+                    lambda i: downloader._download_file("user/repo", f"model-{i}.safetensors"),
+                    range(32),
+                )
+            )
+
+        assert len(results) == 32
+        assert 1 < counts["max_in_flight"] <= 8
 
     def test_download_file_failure(self, downloader):
         """Test file download failure"""
+        with (
+            patch("hf_downloader.hf_hub_download", side_effect=OSError("Download error")),
+            pytest.raises(OSError, match="Download error"),
+        ):
+            downloader._download_file("user/repo", "model.safetensors")
+
+    def test_download_file_retries_transient_errors(self, downloader):
+        """Test that connection errors are retried with backoff"""
         with (
             patch(
-                "subprocess.run",
-                side_effect=subprocess.CalledProcessError(1, "hf", stderr="Download error"),
-            ),
-            pytest.raises(subprocess.CalledProcessError),
+                "hf_downloader.hf_hub_download",
+                side_effect=[ConnectionError("reset"), TimeoutError("slow"), "/cache/model"],
+            ) as mock_download,
+            patch("hf_downloader.time.sleep") as mock_sleep,
+        ):
+            result = downloader._download_file("user/repo", "model.safetensors")
+
+        assert result == "/cache/model"
+        assert mock_download.call_count == 3
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [1, 2]
+
+    def test_download_file_gives_up_after_max_attempts(self, downloader):
+        """Test that retries stop after DOWNLOAD_ATTEMPTS"""
+        with (
+            patch(
+                "hf_downloader.hf_hub_download", side_effect=ConnectionError("down")
+            ) as mock_download,
+            patch("hf_downloader.time.sleep"),
+            pytest.raises(ConnectionError),
         ):
             downloader._download_file("user/repo", "model.safetensors")
 
+        assert mock_download.call_count == hf_downloader.DOWNLOAD_ATTEMPTS
+
+    @pytest.mark.parametrize(("status", "transient"), [(404, False), (429, True), (503, True)])
+    def test_is_transient_http_status(self, status, transient):
+        """Test which HTTP errors are retried"""
+        from huggingface_hub.utils import HfHubHTTPError
+
+        error = HfHubHTTPError("error", response=Mock(status_code=status))
+        assert hf_downloader._is_transient(error) is transient
+
+    def test_is_transient_follows_cause(self):
+        """Test that wrapped network errors are retried"""
+        try:
+            try:
+                raise ConnectionError("reset")
+            except ConnectionError as e:
+                raise FileNotFoundError("not in local cache") from e
+        except FileNotFoundError as wrapped:
+            assert hf_downloader._is_transient(wrapped)
+
+
+@pytest.fixture(scope="module")
+def cached_file(tmp_path_factory):
+    """A fake file in the HF cache, shared because tests only read or link it"""
+    cached_file = tmp_path_factory.mktemp("hf_cache") / "cached.safetensors"
+    cached_file.write_bytes(b"fake model data")
+    return cached_file
+
 
 class TestDownloadAndMerge:
     """Test download and merge operations"""
 
     @pytest.fixture
-    def downloader(self):
-        return HFDownloader()
+    def downloader(self, downloader, monkeypatch):
+        monkeypatch.setattr(downloader.api, "repo_info", Mock(return_value=Mock(sha="abc123")))
+        return downloader
 
-    @pytest.fixture
-    def temp_dir(self):
-        """Create a temporary directory for test outputs"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            yield tmpdir
+    def test_download_single_file(self, downloader, cached_file, tmp_path, monkeypatch):
+        """Test downloading a single file (copy operation)"""
+        monkeypatch.setattr(downloader, "_download_file", lambda *a, **kw: str(cached_file))
+        result = downloader.download_and_merge(
+            repo_id="user/repo",
+            folder_path="root",
+            files=["model.safetensors"],
+            output_dir=str(tmp_path),
+            output_name="test_model",
+        )
+
+        assert result == str(tmp_path / "test_model.safetensors")
+        result_path = Path(result)
+        assert result_path.exists()
+        assert not result_path.is_symlink()
+        assert result_path.read_bytes() == cached_file.read_bytes()
+
+    def test_download_single_file_copy_fallback(self, downloader, tmp_path):
+        """Test that a single file is copied when it cannot be linked"""
+        cached_file = tmp_path / "cached.safetensors"
+        cached_file.write_bytes(b"fake model data")
+        os.utime(cached_file, (1_600_000_000, 1_600_000_000))
 
-    def test_download_and_merge_no_cli(self, downloader, temp_dir):
-        """Test that download fails gracefully when HF CLI is not available"""
         with (
-            patch.object(downloader, "_check_hf_cli", return_value=False),
-            pytest.raises(RuntimeError, match="HF CLI not found"),
+            patch.object(downloader, "_download_file", return_value=str(cached_file)),
+            patch("hf_downloader.os.link", side_effect=OSError("cross-device link")),
+            patch("hf_downloader._reflink", return_value=False),
         ):
-            downloader.download_and_merge(
+            result = downloader.download_and_merge(
                 repo_id="user/repo",
                 folder_path="root",
                 files=["model.safetensors"],
-                output_dir=temp_dir,
+                output_dir=str(tmp_path / "out"),
                 output_name="test_model",
             )
 
-    def test_download_single_file(self, downloader, temp_dir):
-        """Test downloading a single file (copy operation)"""
-        # Create a fake cached file
-        with tempfile.NamedTemporaryFile(suffix=".safetensors", delete=False) as f:
-            cached_path = f.name
-            f.write(b"fake model data")
+        assert Path(result).read_bytes() == b"fake model data"
+        assert Path(result).stat().st_ino != cached_file.stat().st_ino
+        assert Path(result).stat().st_mtime == 1_600_000_000
 
-        try:
-            with (
-                patch.object(downloader, "_check_hf_cli", return_value=True),
-                patch.object(downloader, "_hf_login"),
-                patch.object(downloader, "_download_file", return_value=cached_path),
-            ):
-                result = downloader.download_and_merge(
-                    repo_id="user/repo",
-                    folder_path="root",
-                    files=["model.safetensors"],
-                    output_dir=temp_dir,
-                    output_name="test_model",
-                )
-
-                assert result == str(Path(temp_dir) / "test_model.safetensors")
-                result_path = Path(result)
-                assert result_path.exists()
-                if result_path.is_symlink():
-                    assert result_path.resolve() == Path(cached_path).resolve()
-                else:
-                    assert result_path.read_bytes() == Path(cached_path).read_bytes()
-        finally:
-            Path(cached_path).unlink(missing_ok=True)
-
-    def test_download_with_progress_callback(self, downloader, temp_dir):
+    def test_download_with_progress_callback(self, downloader, cached_file, tmp_path, monkeypatch):
         """Test that progress callbacks are called correctly"""
-        # Create a fake cached file
-        with tempfile.NamedTemporaryFile(suffix=".safetensors", delete=False) as f:
-            cached_path = f.name
-            f.write(b"fake model data")
-
         progress_calls = []
 
         def progress_callback(stage, current, total, message):
             progress_calls.append((stage, current, total, message))
 
-        try:
-            with (
-                patch.object(downloader, "_check_hf_cli", return_value=True),
-                patch.object(downloader, "_hf_login"),
-                patch.object(downloader, "_download_file", return_value=cached_path),
-            ):
-                downloader.download_and_merge(
-                    repo_id="user/repo",
-                    folder_path="root",
-                    files=["model.safetensors"],
-                    output_dir=temp_dir,
-                    output_name="test_model",
-                    progress_callback=progress_callback,
-                )
+        monkeypatch.setattr(downloader, "_download_file", lambda *a, **kw: str(cached_file))
+        downloader.download_and_merge(
+            repo_id="user/repo",
+            folder_path="root",
+            files=["model.safetensors"],
+            output_dir=str(tmp_path),
+            output_name="test_model",
+            progress_callback=progress_callback,
+        )
+
+        # Verify progress callbacks were called
+        assert len(progress_calls) > 0
+        # Check for expected stages
+        stages = {call[0] for call in progress_calls}
+        assert "download" in stages
+        assert "copy" in stages
+
+    def test_download_preserves_file_order(self, downloader, tmp_path):
+        """Test that concurrently downloaded shards are merged in request order"""
+        files = [f"model-0000{i}-of-00003.safetensors" for i in range(1, 4)]
+
+        def fake_download(repo_id, file_path, *args, **kwargs):
+            # Finish the first shard last so completion order differs from request order
+            time.sleep(0.05 if file_path.startswith("model-00001") else 0)
+            return f"/cache/{file_path}"
 
-                # Verify progress callbacks were called
-                assert len(progress_calls) > 0
-                # Check for expected stages
-                stages = {call[0] for call in progress_calls}
-                assert "download" in stages
-                assert "copy" in stages
-        finally:
-            Path(cached_path).unlink(missing_ok=True)
+        with (
+            patch.object(downloader, "_download_file", side_effect=fake_download),
+            patch.object(downloader, "_merge_files") as mock_merge,
+        ):
+            downloader.download_and_merge(
+                repo_id="user/repo",
+                folder_path="root",
+                files=files,
+                output_dir=str(tmp_path),
+                output_name="test_model",
+            )
 
+        assert mock_merge.call_args[0][0] == [f"/cache/{name}" for name in files]
 
-class TestMergeFiles:
-    """Test file merging functionality"""
+    def test_shard_progress_is_combined(self, downloader, tmp_path):
+        """Test that concurrent shards report one running byte total, not their own counts"""
+        reports = []
 
-    @pytest.fixture
-    def downloader(self):
-        return HFDownloader()
+        def fake_download(repo_id, file_path, progress_callback, *args, **kwargs):
+            # Each shard is 100 bytes and reports halfway before finishing
+            progress_callback("download", 50, 100, "tqdm")
+            path = tmp_path / file_path
+            path.write_bytes(b"x" * 100)
+            return str(path)
 
-    def test_merge_files_basic(self, downloader):
-        """Test basic merge operation with mock safetensors"""
-        import torch
-        from safetensors.torch import save_file
+        with (
+            patch.object(downloader, "_download_file", side_effect=fake_download),
+            patch.object(downloader, "_merge_files", return_value=0),
+        ):
+            downloader.download_and_merge(
+                repo_id="user/repo",
+                folder_path="root",
+                files=[f"model-0000{i}-of-00004.safetensors" for i in range(1, 5)],
+                output_dir=str(tmp_path / "out"),
+                output_name="test_model",
+                progress_callback=lambda *call: reports.append(call),
+            )
+
+        download = [(current, total) for stage, current, total, _ in reports if stage == "download"]
+        currents = [current for current, _ in download]
+        assert currents == sorted(currents)
+        assert download[-1] == (400, 400)
+
+    def test_parallel_download_timing(self, downloader, tmp_path, monkeypatch):
+        """Test that shards download concurrently and completions are counted, not indexed"""
+        monkeypatch.setenv("HF_PARALLEL_DOWNLOADING_WORKERS", "8")
+        files = [f"model-0000{i}-of-00008.safetensors" for i in range(1, 9)]
+        completed = []
+        lock = threading.Lock()
+        counts = {"in_flight": 0, "max_in_flight": 0}
+        all_started = threading.Event()
+
+        def fake_download(repo_id, file_path, *args, **kwargs):
+            with lock:
+                counts["in_flight"] += 1
+                counts["max_in_flight"] = max(counts["max_in_flight"], counts["in_flight"])
+                if counts["in_flight"] == len(files):
+                    all_started.set()
+            # Hold every shard until all of them are in flight; sequential downloads time out
+            all_started.wait(1)
+            with lock:
+                counts["in_flight"] -= 1
+            # One byte per shard, so the combined byte count equals the shards done
+            path = tmp_path / file_path
+            path.write_bytes(b"x")
+            return str(path)
+
+        def progress_callback(stage, current, total, message):
+            if stage == "download" and message.startswith("Downloaded "):
+                completed.append(current)
+
+        with (
+            patch.object(downloader, "_download_file", side_effect=fake_download),
+            patch.object(downloader, "_merge_files", return_value=0),
+        ):
+            downloader.download_and_merge(
+                repo_id="user/repo",
+                folder_path="root",
+                files=files,
+                output_dir=str(tmp_path),
+                output_name="test_model",
+                progress_callback=progress_callback,
+            )
+
+        assert counts["max_in_flight"] == len(files)
+        assert completed == list(range(1, 9))
+
+    @requires_torch
+    def test_download_without_merge_writes_index(self, downloader, tmp_path):
+        """Test that merge=False links the shards and writes a weight map index"""
+        cache_dir = tmp_path / "cache"
+        cache_dir.mkdir()
+        shards = {
+            "model-00001-of-00002.safetensors": {"a": torch.randn(4, 3)},
+            "model-00002-of-00002.safetensors": {"b": torch.arange(5, dtype=torch.int64)},
+        }
+        for name, tensors in shards.items():
+            save_file(tensors, str(cache_dir / name))
 
-        # Create temporary shard files
+        output_dir = tmp_path / "out"
         with (
-            tempfile.TemporaryDirectory() as tmpdir,
-            tempfile.NamedTemporaryFile(suffix=".safetensors", dir=tmpdir, delete=False) as f1,
-            tempfile.NamedTemporaryFile(suffix=".safetensors", dir=tmpdir, delete=False) as f2,
+            patch.object(
+                downloader,
+                "_download_file",
+                side_effect=lambda repo_id, file_path, *args, **kwargs: str(cache_dir / file_path),
+            ),
+            patch.object(downloader, "_merge_files") as mock_merge,
         ):
-            # Create mock tensor data
-            shard1 = {"layer1.weight": torch.randn(10, 10)}
-            shard2 = {"layer2.weight": torch.randn(10, 10)}
+            result = downloader.download_and_merge(
+                repo_id="user/repo",
+                folder_path="root",
+                files=list(shards),
+                output_dir=str(output_dir),
+                output_name="test_model",
+                merge=False,
+            )
 
-            save_file(shard1, f1.name)
-            save_file(shard2, f2.name)
+        mock_merge.assert_not_called()
+        assert result == str(output_dir / "test_model.safetensors.index.json")
+        index = json.loads(Path(result).read_text())
+        assert index["weight_map"] == {
+            "a": "test_model-00001-of-00002.safetensors",
+            "b": "test_model-00002-of-00002.safetensors",
+        }
+        assert index["metadata"]["total_size"] == 4 * 3 * 4 + 5 * 8
+        shard = output_dir / "test_model-00002-of-00002.safetensors"
+        assert shard.stat().st_ino == (cache_dir / "model-00002-of-00002.safetensors").stat().st_ino
+        assert torch.equal(
+            load_file(str(shard))["b"], shards["model-00002-of-00002.safetensors"]["b"]
+        )
 
-            output_path = str(Path(tmpdir) / "merged.safetensors")
 
-            # Merge the files
-            downloader._merge_files([f1.name, f2.name], output_path)
+@pytest.fixture(scope="module")
+def shard_tensors():
+    """Tensors shared by the merge tests, each test saves the ones it needs"""
+    return {"layer1.weight": torch.randn(10, 10), "layer2.weight": torch.randn(10, 10)}
 
-            # Verify merged file exists and contains all tensors
-            assert Path(output_path).exists()
 
-            from safetensors.torch import load_file
+@requires_torch
+class TestMergeFiles:
+    """Test file merging functionality"""
 
-            merged = load_file(output_path)
-            assert "layer1.weight" in merged
-            assert "layer2.weight" in merged
+    def test_merge_files_basic(self, downloader, tmp_path, shard_tensors):
+        """Test basic merge operation with mock safetensors"""
+        f1 = tmp_path / "s1.safetensors"
+        f2 = tmp_path / "s2.safetensors"
+        save_file({"layer1.weight": shard_tensors["layer1.weight"]}, str(f1))
+        save_file({"layer2.weight": shard_tensors["layer2.weight"]}, str(f2))
 
-    def test_merge_files_with_progress(self, downloader):
-        """Test merge operation with progress callback"""
-        import torch
-        from safetensors.torch import save_file
+        output_path = str(tmp_path / "merged.safetensors")
+        downloader._merge_files([str(f1), str(f2)], output_path)
 
+        # Verify merged file exists and contains all tensors
+        assert Path(output_path).exists()
+        merged = load_file(output_path)
+        assert "layer1.weight" in merged
+        assert "layer2.weight" in merged
+
+    def test_merge_files_with_progress(self, downloader, tmp_path, shard_tensors):
+        """Test merge operation with progress callback"""
         progress_calls = []
 
         def progress_callback(stage, current, total, message):
             progress_calls.append((stage, current, total, message))
 
+        f1 = tmp_path / "s1.safetensors"
+        save_file({"layer1.weight": shard_tensors["layer1.weight"]}, str(f1))
+
+        output_path = str(tmp_path / "merged.safetensors")
+        downloader._merge_files([str(f1)], output_path, progress_callback)
+
+        assert len(progress_calls) > 0
+        assert all(call[0] == "merge" for call in progress_calls)
+
+    def test_merge_files_preserves_tensors(self, downloader, tmp_path):
+        """Test that merged tensors, dtypes and metadata match the shards"""
+        shard1 = {"a.weight": torch.randn(4, 3), "b.bias": torch.arange(5, dtype=torch.int64)}
+        shard2 = {"c.weight": torch.randn(2, 2).to(torch.bfloat16), "scalar": torch.tensor(1.5)}
+        save_file(shard1, str(tmp_path / "model-00001-of-00002.safetensors"), {"format": "pt"})
+        save_file(shard2, str(tmp_path / "model-00002-of-00002.safetensors"), {"format": "pt"})
+
+        output_path = str(tmp_path / "merged.safetensors")
+        size_bytes = downloader._merge_files(
+            [
+                str(tmp_path / "model-00002-of-00002.safetensors"),
+                str(tmp_path / "model-00001-of-00002.safetensors"),
+            ],
+            output_path,
+        )
+
+        assert size_bytes == Path(output_path).stat().st_size
+        merged = load_file(output_path)
+        assert merged.keys() == {*shard1, *shard2}
+        for name, tensor in {**shard1, **shard2}.items():
+            assert merged[name].dtype == tensor.dtype
+            assert torch.equal(merged[name], tensor)
+        with safe_open(output_path, framework="pt") as f:
+            assert f.metadata() == {"format": "pt"}
+
+    def test_merge_files_copies_in_chunks(self, downloader, tmp_path):
+        """Test that tensors larger than the copy buffer are merged intact"""
+        shard1 = {"a": torch.randn(64, 33), "b": torch.randn(17)}
+        shard2 = {"c": torch.randn(9, 5).to(torch.float16)}
+        save_file(shard1, str(tmp_path / "model-00001-of-00002.safetensors"))
+        save_file(shard2, str(tmp_path / "model-00002-of-00002.safetensors"))
+
+        output_path = str(tmp_path / "merged.safetensors")
+        with patch("hf_downloader.MERGE_CHUNK_SIZE", 100):
+            downloader._merge_files(
+                [
+                    str(tmp_path / "model-00001-of-00002.safetensors"),
+                    str(tmp_path / "model-00002-of-00002.safetensors"),
+                ],
+                output_path,
+            )
+
+        merged = load_file(output_path)
+        for name, tensor in {**shard1, **shard2}.items():
+            assert torch.equal(merged[name], tensor)
+
+    def test_merge_files_without_copy_file_range(self, downloader, tmp_path):
+        """Test the userspace copy used when copy_file_range is unsupported"""
+        import errno
+
+        shard1 = {"a": torch.randn(64, 33)}
+        shard2 = {"b": torch.randn(9, 5).to(torch.float16)}
+        save_file(shard1, str(tmp_path / "model-00001-of-00002.safetensors"))
+        save_file(shard2, str(tmp_path / "model-00002-of-00002.safetensors"))
+
+        output_path = str(tmp_path / "merged.safetensors")
         with (
-            tempfile.TemporaryDirectory() as tmpdir,
-            tempfile.NamedTemporaryFile(suffix=".safetensors", dir=tmpdir, delete=False) as f1,
+            patch("hf_downloader.MERGE_CHUNK_SIZE", 100),
+            patch(
+                "hf_downloader.os.copy_file_range",
+                side_effect=OSError(errno.EXDEV, "Invalid cross-device link"),
+                create=True,
+            ),
         ):
-            shard1 = {"layer1.weight": torch.randn(10, 10)}
-            save_file(shard1, f1.name)
+            downloader._merge_files(
+                [
+                    str(tmp_path / "model-00001-of-00002.safetensors"),
+                    str(tmp_path / "model-00002-of-00002.safetensors"),
+                ],
+                output_path,
+            )
+
+        merged = load_file(output_path)
+        for name, tensor in {**shard1, **shard2}.items():
+            assert torch.equal(merged[name], tensor)
+
+    def test_merge_files_preallocates_output(self, downloader, tmp_path):
+        """Test that the merged file is reserved at its final size before copying"""
+        shard1 = {"a": torch.randn(8, 8)}
+        shard2 = {"b": torch.randn(3)}
+        save_file(shard1, str(tmp_path / "model-00001-of-00002.safetensors"))
+        save_file(shard2, str(tmp_path / "model-00002-of-00002.safetensors"))
+
+        output_path = str(tmp_path / "merged.safetensors")
+        fallocate = Mock(return_value=0)
+        with patch("hf_downloader._libc_fallocate", return_value=fallocate):
+            size_bytes = downloader._merge_files(
+                [
+                    str(tmp_path / "model-00001-of-00002.safetensors"),
+                    str(tmp_path / "model-00002-of-00002.safetensors"),
+                ],
+                output_path,
+            )
+
+        assert fallocate.call_args.args[1:] == (hf_downloader.FALLOC_FL_KEEP_SIZE, 0, size_bytes)
+        assert Path(output_path).stat().st_size == size_bytes
+        merged = load_file(output_path)
+        for name, tensor in {**shard1, **shard2}.items():
+            assert torch.equal(merged[name], tensor)
+
+    def test_merge_files_without_native_fallocate(self, downloader, tmp_path):
+        """Test that unsupported fallocate never falls back to writing every block"""
+        import errno
+
+        def unsupported(*args):
+            ctypes.set_errno(errno.EOPNOTSUPP)
+            return -1
 
-            output_path = str(Path(tmpdir) / "merged.safetensors")
-            downloader._merge_files([f1.name], output_path, progress_callback)
+        shards = {"a": torch.randn(8, 8)}
+        save_file(shards, str(tmp_path / "model-00001-of-00001.safetensors"))
+
+        output_path = str(tmp_path / "merged.safetensors")
+        with (
+            patch("hf_downloader._libc_fallocate", return_value=unsupported),
+            patch("hf_downloader.os.posix_fallocate", create=True) as mock_posix_fallocate,
+        ):
+            downloader._merge_files(
+                [str(tmp_path / "model-00001-of-00001.safetensors")], output_path
+            )
+
+        mock_posix_fallocate.assert_not_called()
+        assert torch.equal(load_file(output_path)["a"], shards["a"])
+
+    @pytest.mark.parametrize("native", [True, False])
+    def test_merge_files_disk_full(self, downloader, tmp_path, native):
+        """Test that a merge that cannot fit fails before copying and leaves no output"""
+        import errno
+
+        def no_space(*args):
+            ctypes.set_errno(errno.ENOSPC if native else errno.EOPNOTSUPP)
+            return -1
+
+        save_file({"a": torch.randn(8, 8)}, str(tmp_path / "model-00001-of-00001.safetensors"))
+
+        output_path = tmp_path / "merged.safetensors"
+        with (
+            patch("hf_downloader._libc_fallocate", return_value=no_space),
+            patch(
+                "hf_downloader.os.fstatvfs",
+                return_value=SimpleNamespace(f_bavail=0, f_frsize=4096),
+                create=True,
+            ),
+            patch("hf_downloader._copy_range") as mock_copy,
+            pytest.raises(OSError) as excinfo,
+        ):
+            downloader._merge_files(
+                [str(tmp_path / "model-00001-of-00001.safetensors")], str(output_path)
+            )
 
-            assert len(progress_calls) > 0
-            assert all(call[0] == "merge" for call in progress_calls)
+        assert excinfo.value.errno == errno.ENOSPC
+        mock_copy.assert_not_called()
+        assert not output_path.exists()
+
+    def test_merge_files_orders_shards_numerically(self, downloader, tmp_path):
+        """Test that unpadded shard numbers are merged in numeric order"""
+        save_file({"w": torch.zeros(2)}, str(tmp_path / "model-2-of-10.safetensors"))
+        save_file({"w": torch.ones(2)}, str(tmp_path / "model-10-of-10.safetensors"))
+
+        output_path = str(tmp_path / "merged.safetensors")
+        downloader._merge_files(
+            [
+                str(tmp_path / "model-10-of-10.safetensors"),
+                str(tmp_path / "model-2-of-10.safetensors"),
+            ],
+            output_path,
+        )
+
+        # Later shards win on duplicate names, so shard 10 must be applied last
+        assert torch.equal(load_file(output_path)["w"], torch.ones(2))
@@ -3,19 +3,36 @@ Comprehensive tests for server routes
 Tests API endpoints, request validation, and async operations
 """
 
-from unittest.mock import AsyncMock, Mock, patch
+import asyncio
+import concurrent.futures
+import json
+import threading
+import time
+from pathlib import Path
+from typing import ClassVar
+from unittest.mock import Mock, patch
 
 import pytest
 
-from server_routes import (
-    abort_download_handler,
-    delete_file_handler,
-    download_model_handler,
-    get_model_dir,
-    get_progress_handler,
-    list_files_handler,
-    scan_repo_handler,
-)
+import server_routes
+from server_routes import get_model_dir
+
+
+@pytest.fixture(autouse=True)
+def isolated_registries():
+    """Run each test against empty task registries, restoring their contents afterwards"""
+    registries = (
+        server_routes.download_progress,
+        server_routes.download_tasks,
+        server_routes.download_cancels,
+    )
+    saved = [dict(registry) for registry in registries]
+    for registry in registries:
+        registry.clear()
+    yield
+    for registry, contents in zip(registries, saved, strict=True):
+        registry.clear()
+        registry.update(contents)
 
 
 class TestGetModelDir:
@@ -41,16 +58,57 @@ class TestGetModelDir:
         result = get_model_dir("unknown_type")
         assert "checkpoints" in result  # Should fallback to checkpoints
 
+    def test_get_model_dir_is_cached(self):
+        """Test that repeat lookups for a model type are served from the cache"""
+        get_model_dir.cache_clear()
+        first = get_model_dir("vae")
+        second = get_model_dir("vae")
+
+        assert first == second
+        assert get_model_dir.cache_info().hits >= 1
+
+
+class TestJsonResponse:
+    """Test request and response encoding"""
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_json_response_encoding(self, monkeypatch, use_orjson):
+        """Test that responses encode the same with and without orjson"""
+        if use_orjson:
+            pytest.importorskip("orjson")
+        else:
+            monkeypatch.setattr(server_routes, "orjson", None)
+
+        payload = {"success": True, "models": [{"name": "model", "size": 1}]}
+        response = server_routes.json_response(payload, status=201)
+
+        assert response.status == 201
+        assert response.content_type == "application/json"
+        assert json.loads(response.body) == payload
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    async def test_request_body_decoding(self, client, monkeypatch, use_orjson):
+        """Test that request bodies decode the same with and without orjson"""
+        if use_orjson:
+            pytest.importorskip("orjson")
+        else:
+            monkeypatch.setattr(server_routes, "orjson", None)
+
+        response = await client.post(
+            "/hf_downloader/progress_batch", json={"task_ids": ["ünknown"]}
+        )
+
+        assert response.status == 200
+        assert (await response.json())["tasks"]["ünknown"]["status"] == "not_found"
+
 
 class TestScanRepoHandler:
     """Test /hf_downloader/scan endpoint"""
 
     @pytest.mark.asyncio
-    async def test_scan_repo_success(self):
+    async def test_scan_repo_success(self, client):
         """Test successful repo scan"""
-        mock_request = Mock()
-        mock_request.json = AsyncMock(return_value={"repo_id": "user/test-repo"})
-
         mock_models = [
             {
                 "path": "root",
@@ -62,101 +120,160 @@ class TestScanRepoHandler:
             }
         ]
 
-        with patch("server_routes.HFDownloader") as mock_downloader_class:
+        with patch("server_routes.get_downloader") as mock_get_downloader:
             mock_downloader = Mock()
             mock_downloader.scan_repo.return_value = mock_models
-            mock_downloader_class.return_value = mock_downloader
+            mock_get_downloader.return_value = mock_downloader
 
-            response = await scan_repo_handler(mock_request)
+            response = await client.post("/hf_downloader/scan", json={"repo_id": "user/test-repo"})
 
             assert response.status == 200
-            body = response.body
-            assert b"success" in body
-            assert b"user/test-repo" in body
+            body = await response.json()
+            assert body["success"] is True
+            assert body["repo_id"] == "user/test-repo"
 
     @pytest.mark.asyncio
-    async def test_scan_repo_missing_repo_id(self):
-        """Test scan with missing repo_id"""
-        mock_request = Mock()
-        mock_request.json = AsyncMock(return_value={})
+    async def test_slow_scan_does_not_block_progress(self, client):
+        """Test that progress requests are served while a scan is running"""
+        from server_routes import download_progress
+
+        scan_started = threading.Event()
+        release_scan = threading.Event()
+
+        def slow_scan(*args):
+            scan_started.set()
+            release_scan.wait(5)
+            return []
+
+        download_progress["poll_task"] = {"status": "running", "stage": "download"}
+
+        try:
+            with patch("server_routes.get_downloader") as mock_get_downloader:
+                mock_get_downloader.return_value.scan_repo = slow_scan
+                scan = asyncio.create_task(
+                    client.post("/hf_downloader/scan", json={"repo_id": "user/test-repo"})
+                )
+                await asyncio.to_thread(scan_started.wait, 5)
+
+                # The scan stays blocked until the progress response is back
+                response = await asyncio.wait_for(
+                    client.get("/hf_downloader/progress/poll_task"), timeout=5
+                )
+                scan_was_blocked = not scan.done() and not release_scan.is_set()
+
+                release_scan.set()
+                scan_response = await scan
+
+            assert response.status == 200
+            assert scan_was_blocked
+            assert scan_response.status == 200
+        finally:
+            release_scan.set()
+            download_progress.pop("poll_task", None)
 
-        response = await scan_repo_handler(mock_request)
+    @pytest.mark.asyncio
+    async def test_scan_repo_missing_repo_id(self, client):
+        """Test scan with missing repo_id"""
+        response = await client.post("/hf_downloader/scan", json={})
         assert response.status == 400
 
     @pytest.mark.asyncio
-    async def test_scan_repo_invalid_format(self):
+    @pytest.mark.parametrize(
+        "repo_id", ["invalid-format", "https://huggingface.co/user/model", "user/model/extra"]
+    )
+    async def test_scan_repo_invalid_format(self, client, repo_id):
         """Test scan with invalid repo_id format"""
-        mock_request = Mock()
-        mock_request.json = AsyncMock(return_value={"repo_id": "invalid-format"})
-
-        response = await scan_repo_handler(mock_request)
+        response = await client.post("/hf_downloader/scan", json={"repo_id": repo_id})
         assert response.status == 400
 
     @pytest.mark.asyncio
-    async def test_scan_repo_api_error(self):
+    async def test_scan_repo_api_error(self, client):
         """Test scan with API error"""
-        mock_request = Mock()
-        mock_request.json = AsyncMock(return_value={"repo_id": "user/test-repo"})
-
-        with patch("server_routes.HFDownloader") as mock_downloader_class:
+        with patch("server_routes.get_downloader") as mock_get_downloader:
             mock_downloader = Mock()
             mock_downloader.scan_repo.side_effect = Exception("API Error")
-            mock_downloader_class.return_value = mock_downloader
+            mock_get_downloader.return_value = mock_downloader
 
-            response = await scan_repo_handler(mock_request)
+            response = await client.post("/hf_downloader/scan", json={"repo_id": "user/test-repo"})
             assert response.status == 500
 
 
+class TestScanManyHandler:
+    """Test /hf_downloader/scan_many endpoint"""
+
+    @pytest.mark.asyncio
+    async def test_scan_many_success(self, client):
+        """Test that each repo gets its own result or error"""
+        with patch("server_routes.get_downloader") as mock_get_downloader:
+            mock_downloader = Mock()
+            mock_downloader.scan_repos.return_value = {
+                "user/a": [{"path": "root", "suggested_name": "a"}],
+                "user/b": Exception("Repository not found"),
+            }
+            mock_get_downloader.return_value = mock_downloader
+
+            response = await client.post(
+                "/hf_downloader/scan_many", json={"repo_ids": ["user/a", "user/b"]}
+            )
+
+        assert response.status == 200
+        results = (await response.json())["results"]
+        assert results["user/a"] == {
+            "success": True,
+            "models": [{"path": "root", "suggested_name": "a"}],
+        }
+        assert results["user/b"] == {"success": False, "error": "Repository not found"}
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("body", [{}, {"repo_ids": []}, {"repo_ids": ["invalid-format"]}])
+    async def test_scan_many_invalid_request(self, client, body):
+        """Test scan_many request validation"""
+        response = await client.post("/hf_downloader/scan_many", json=body)
+        assert response.status == 400
+
+
 class TestDownloadModelHandler:
     """Test /hf_downloader/download endpoint"""
 
+    DOWNLOAD_REQUEST: ClassVar[dict] = {
+        "repo_id": "user/test-repo",
+        "model_path": "root",
+        "files": ["model.safetensors"],
+        "output_name": "test_model",
+        "model_type": "checkpoint",
+    }
+
     @pytest.mark.asyncio
-    async def test_download_start_success(self):
+    async def test_download_start_success(self, client):
         """Test successful download start"""
-        mock_request = Mock()
-        mock_request.json = AsyncMock(
-            return_value={
-                "repo_id": "user/test-repo",
-                "model_path": "root",
-                "files": ["model.safetensors"],
-                "output_name": "test_model",
-                "model_type": "checkpoint",
-            }
-        )
+        from server_routes import download_progress, download_tasks
+
+        with patch("server_routes.get_downloader") as mock_get_downloader:
+            mock_get_downloader.return_value.download_and_merge.return_value = "/models/model"
+            response = await client.post("/hf_downloader/download", json=self.DOWNLOAD_REQUEST)
+            task_id = (await response.json())["task_id"]
+            await download_tasks[task_id]
 
-        response = await download_model_handler(mock_request)
         assert response.status == 200
+        assert download_progress[task_id]["status"] == "completed"
 
     @pytest.mark.asyncio
-    async def test_download_missing_required_fields(self):
+    async def test_download_missing_required_fields(self, client):
         """Test download with missing required fields"""
-        mock_request = Mock()
-        mock_request.json = AsyncMock(
-            return_value={
+        response = await client.post(
+            "/hf_downloader/download",
+            json={
                 "repo_id": "user/test-repo",
                 # Missing files and output_name
-            }
+            },
         )
-
-        response = await download_model_handler(mock_request)
         assert response.status == 400
 
     @pytest.mark.asyncio
-    async def test_download_already_in_progress(self):
+    async def test_download_already_in_progress(self, client):
         """Test starting download when one is already in progress"""
         from server_routes import download_tasks
 
-        mock_request = Mock()
-        mock_request.json = AsyncMock(
-            return_value={
-                "repo_id": "user/test-repo",
-                "model_path": "root",
-                "files": ["model.safetensors"],
-                "output_name": "test_model",
-                "model_type": "checkpoint",
-            }
-        )
-
         # Create a mock ongoing task
         task_id = "user_test-repo_test_model"
         mock_task = Mock()
@@ -164,7 +281,7 @@ class TestDownloadModelHandler:
         download_tasks[task_id] = mock_task
 
         try:
-            response = await download_model_handler(mock_request)
+            response = await client.post("/hf_downloader/download", json=self.DOWNLOAD_REQUEST)
             assert response.status == 409  # Conflict
         finally:
             # Clean up
@@ -175,13 +292,10 @@ class TestProgressHandler:
     """Test /hf_downloader/progress/<task_id> endpoint"""
 
     @pytest.mark.asyncio
-    async def test_get_progress_running(self):
+    async def test_get_progress_running(self, client):
         """Test getting progress for running task"""
         from server_routes import download_progress
 
-        mock_request = Mock()
-        mock_request.match_info = {"task_id": "test_task"}
-
         download_progress["test_task"] = {
             "status": "running",
             "stage": "download",
@@ -191,28 +305,55 @@ class TestProgressHandler:
         }
 
         try:
-            response = await get_progress_handler(mock_request)
+            response = await client.get("/hf_downloader/progress/test_task")
             assert response.status == 200
         finally:
             download_progress.pop("test_task", None)
 
     @pytest.mark.asyncio
-    async def test_get_progress_not_found(self):
-        """Test getting progress for non-existent task"""
-        mock_request = Mock()
-        mock_request.match_info = {"task_id": "nonexistent"}
+    async def test_get_progress_etag_304(self, client):
+        """Test that an unchanged entry is answered with an empty 304"""
+        from server_routes import download_progress
+
+        download_progress["etag_task"] = {
+            "status": "running",
+            "stage": "download",
+            "current": 1,
+            "total": 3,
+            "message": "Downloading file 1/3",
+        }
 
-        response = await get_progress_handler(mock_request)
+        try:
+            first = await client.get("/hf_downloader/progress/etag_task")
+            etag = first.headers["ETag"]
+            second = await client.get(
+                "/hf_downloader/progress/etag_task", headers={"If-None-Match": etag}
+            )
+
+            download_progress["etag_task"]["current"] = 2
+            third = await client.get(
+                "/hf_downloader/progress/etag_task", headers={"If-None-Match": etag}
+            )
+
+            assert first.status == 200
+            assert second.status == 304
+            assert await second.read() == b""
+            assert third.status == 200
+            assert third.headers["ETag"] != etag
+        finally:
+            download_progress.pop("etag_task", None)
+
+    @pytest.mark.asyncio
+    async def test_get_progress_not_found(self, client):
+        """Test getting progress for non-existent task"""
+        response = await client.get("/hf_downloader/progress/nonexistent")
         assert response.status == 404
 
     @pytest.mark.asyncio
-    async def test_get_progress_completed(self):
+    async def test_get_progress_completed(self, client):
         """Test getting progress for completed task"""
         from server_routes import download_progress, download_tasks
 
-        mock_request = Mock()
-        mock_request.match_info = {"task_id": "completed_task"}
-
         # Set up completed task
         mock_task = Mock()
         mock_task.done = Mock(return_value=True)
@@ -228,7 +369,7 @@ class TestProgressHandler:
         }
 
         try:
-            response = await get_progress_handler(mock_request)
+            response = await client.get("/hf_downloader/progress/completed_task")
             assert response.status == 200
             # Status should be updated to completed
             assert download_progress["completed_task"]["status"] == "completed"
@@ -237,13 +378,10 @@ class TestProgressHandler:
             download_progress.pop("completed_task", None)
 
     @pytest.mark.asyncio
-    async def test_get_progress_error(self):
+    async def test_get_progress_error(self, client):
         """Test getting progress for task with error"""
         from server_routes import download_progress, download_tasks
 
-        mock_request = Mock()
-        mock_request.match_info = {"task_id": "error_task"}
-
         mock_task = Mock()
         mock_task.done = Mock(return_value=True)
         mock_task.exception = Mock(return_value=Exception("Download failed"))
@@ -258,29 +396,107 @@ class TestProgressHandler:
         }
 
         try:
-            response = await get_progress_handler(mock_request)
+            response = await client.get("/hf_downloader/progress/error_task")
             assert response.status == 200
             assert download_progress["error_task"]["status"] == "error"
         finally:
             download_tasks.pop("error_task", None)
             download_progress.pop("error_task", None)
 
+    @pytest.mark.asyncio
+    async def test_get_progress_terminal_skips_task(self, client):
+        """Test that a finished entry is returned without inspecting its task"""
+        from server_routes import download_progress, download_tasks
+
+        mock_task = Mock()
+        mock_task.done = Mock(side_effect=AssertionError("task inspected"))
+        download_tasks["cancelled_task"] = mock_task
+        download_progress["cancelled_task"] = {"status": "cancelled", "stage": "cancelled"}
+
+        try:
+            response = await client.get("/hf_downloader/progress/cancelled_task")
+            assert response.status == 200
+            assert download_progress["cancelled_task"]["status"] == "cancelled"
+        finally:
+            download_tasks.pop("cancelled_task", None)
+            download_progress.pop("cancelled_task", None)
+
+
+class TestProgressBatchHandler:
+    """Test /hf_downloader/progress_batch endpoint"""
+
+    @pytest.mark.asyncio
+    async def test_progress_batch_mixed(self, client):
+        """Test running, completed and unknown tasks reported in one response"""
+        from server_routes import download_progress, download_tasks
+
+        finished_task = Mock()
+        finished_task.done = Mock(return_value=True)
+        finished_task.exception = Mock(return_value=None)
+        download_tasks["batch_done"] = finished_task
+        download_progress["batch_running"] = {"status": "running", "stage": "download"}
+        download_progress["batch_done"] = {"status": "running", "stage": "merge"}
+
+        try:
+            response = await client.post(
+                "/hf_downloader/progress_batch",
+                json={"task_ids": ["batch_running", "batch_done", "batch_missing"]},
+            )
+            tasks = (await response.json())["tasks"]
+
+            assert response.status == 200
+            assert tasks.keys() == {"batch_running", "batch_done", "batch_missing"}
+            assert tasks["batch_running"]["status"] == "running"
+            assert tasks["batch_done"]["status"] == "completed"
+            assert tasks["batch_missing"]["status"] == "not_found"
+        finally:
+            download_tasks.pop("batch_done", None)
+            download_progress.pop("batch_running", None)
+            download_progress.pop("batch_done", None)
+
+    @pytest.mark.asyncio
+    async def test_progress_batch_etag_304(self, client):
+        """Test that an unchanged set of tasks is answered with an empty 304"""
+        from server_routes import download_progress
+
+        download_progress["batch_etag"] = {"status": "running", "stage": "download", "current": 1}
+        body = {"task_ids": ["batch_etag", "batch_missing"]}
+
+        first = await client.post("/hf_downloader/progress_batch", json=body)
+        etag = first.headers["ETag"]
+        second = await client.post(
+            "/hf_downloader/progress_batch", json=body, headers={"If-None-Match": etag}
+        )
+        download_progress["batch_etag"]["current"] = 2
+        third = await client.post(
+            "/hf_downloader/progress_batch", json=body, headers={"If-None-Match": etag}
+        )
+
+        assert first.status == 200
+        assert second.status == 304
+        assert await second.read() == b""
+        assert third.status == 200
+        assert third.headers["ETag"] != etag
+
+    @pytest.mark.asyncio
+    async def test_progress_batch_invalid_request(self, client):
+        """Test that task_ids must be a list"""
+        response = await client.post(
+            "/hf_downloader/progress_batch", json={"task_ids": "batch_running"}
+        )
+        assert response.status == 400
+
 
 class TestAbortHandler:
     """Test /hf_downloader/abort/<task_id> endpoint"""
 
     @pytest.mark.asyncio
-    async def test_abort_running_task(self):
+    async def test_abort_running_task(self, client):
         """Test aborting a running download"""
         from server_routes import download_progress, download_tasks
 
-        mock_request = Mock()
-        mock_request.match_info = {"task_id": "running_task"}
-
-        mock_task = Mock()
-        mock_task.done = Mock(return_value=False)
-        mock_task.cancel = Mock()
-        download_tasks["running_task"] = mock_task
+        task = asyncio.get_running_loop().create_future()
+        download_tasks["running_task"] = task
 
         download_progress["running_task"] = {
             "status": "running",
@@ -290,51 +506,437 @@ class TestAbortHandler:
         }
 
         try:
-            response = await abort_download_handler(mock_request)
+            response = await client.post("/hf_downloader/abort/running_task")
             assert response.status == 200
-            mock_task.cancel.assert_called_once()
+            assert task.cancelled()
             assert download_progress["running_task"]["status"] == "cancelled"
         finally:
             download_tasks.pop("running_task", None)
             download_progress.pop("running_task", None)
 
     @pytest.mark.asyncio
-    async def test_abort_nonexistent_task(self):
-        """Test aborting non-existent task"""
-        mock_request = Mock()
-        mock_request.match_info = {"task_id": "nonexistent"}
+    async def test_abort_waits_for_worker_thread(self, client):
+        """Test that an abort only reports cancelled once the worker thread has stopped"""
+        from server_routes import download_progress, download_tasks, run_download_task
+
+        worker_stopped = threading.Event()
+
+        def fake_download(progress_callback, **kwargs):
+            try:
+                while True:
+                    progress_callback("download", 1, 2, "Downloading")
+                    time.sleep(0.01)
+            finally:
+                worker_stopped.set()
 
-        response = await abort_download_handler(mock_request)
+        download_progress["drain_task"] = {"status": "starting", "stage": "init"}
+
+        try:
+            with patch("server_routes.get_downloader") as mock_get_downloader:
+                mock_get_downloader.return_value.download_and_merge = fake_download
+                download_tasks["drain_task"] = asyncio.create_task(
+                    run_download_task(
+                        task_id="drain_task",
+                        repo_id="user/repo",
+                        model_path="root",
+                        files=["model.safetensors"],
+                        output_dir="/models",
+                        output_name="model",
+                    )
+                )
+                await asyncio.sleep(0.05)
+
+                response = await client.post("/hf_downloader/abort/drain_task")
+
+            assert response.status == 200
+            assert (await response.json())["status"] == "cancelled"
+            assert worker_stopped.is_set()
+            assert download_progress["drain_task"]["status"] == "cancelled"
+        finally:
+            download_tasks.pop("drain_task", None)
+            download_progress.pop("drain_task", None)
+
+    @pytest.mark.asyncio
+    async def test_abort_reports_cancelling_until_worker_stops(self, client, monkeypatch):
+        """Test that a worker that outlasts the abort wait is reported as still cancelling"""
+        from server_routes import download_progress, download_tasks, run_download_task
+
+        release_worker = threading.Event()
+
+        def fake_download(progress_callback, **kwargs):
+            release_worker.wait(5)
+            progress_callback("download", 1, 2, "Downloading")
+            return "/models/model.safetensors"
+
+        monkeypatch.setattr(server_routes, "CANCEL_TIMEOUT", 0.05)
+        download_progress["stuck_task"] = {"status": "starting", "stage": "init"}
+
+        try:
+            with patch("server_routes.get_downloader") as mock_get_downloader:
+                mock_get_downloader.return_value.download_and_merge = fake_download
+                task = asyncio.create_task(
+                    run_download_task(
+                        task_id="stuck_task",
+                        repo_id="user/repo",
+                        model_path="root",
+                        files=["model.safetensors"],
+                        output_dir="/models",
+                        output_name="model",
+                    )
+                )
+                download_tasks["stuck_task"] = task
+                await asyncio.sleep(0.01)
+
+                response = await client.post("/hf_downloader/abort/stuck_task")
+                status_while_stuck = download_progress["stuck_task"]["status"]
+
+                release_worker.set()
+                await asyncio.gather(task, return_exceptions=True)
+
+            assert (await response.json())["status"] == "cancelling"
+            assert status_while_stuck == "cancelling"
+            assert download_progress["stuck_task"]["status"] == "cancelled"
+        finally:
+            release_worker.set()
+            download_tasks.pop("stuck_task", None)
+            download_progress.pop("stuck_task", None)
+
+    @pytest.mark.asyncio
+    async def test_abort_nonexistent_task(self, client):
+        """Test aborting non-existent task"""
+        response = await client.post("/hf_downloader/abort/nonexistent")
         assert response.status == 404
 
+    @pytest.mark.asyncio
+    async def test_abort_survives_status_overwrite(self):
+        """Test that the worker stops on the cancel signal even if the status was rewritten"""
+        from server_routes import download_cancels, download_progress, run_download_task
+
+        reached_end = []
+
+        def fake_download(progress_callback, **kwargs):
+            download_cancels["race_task"].set()
+            download_progress["race_task"]["status"] = "running"
+            progress_callback("download", 1, 2, "Downloading")
+            reached_end.append(True)
+            return "/models/model.safetensors"
+
+        download_progress["race_task"] = {"status": "starting", "stage": "init"}
+
+        try:
+            with patch("server_routes.get_downloader") as mock_get_downloader:
+                mock_get_downloader.return_value.download_and_merge = fake_download
+                await run_download_task(
+                    task_id="race_task",
+                    repo_id="user/repo",
+                    model_path="root",
+                    files=["model.safetensors"],
+                    output_dir="/models",
+                    output_name="model",
+                )
+
+            assert not reached_end
+            assert download_progress["race_task"]["status"] == "cancelled"
+            assert "race_task" not in download_cancels
+        finally:
+            download_progress.pop("race_task", None)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("reports_progress", "expected"), [(True, "cancelled"), (False, "completed")]
+    )
+    async def test_external_cancel_stops_worker(self, reports_progress, expected):
+        """Test that cancelling the task directly signals the worker and keeps finished output"""
+        from server_routes import download_progress, run_download_task
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def fake_download(progress_callback, **kwargs):
+            started.set()
+            release.wait(5)
+            if reports_progress:
+                progress_callback("download", 1, 2, "Downloading")
+            return "/models/model.safetensors"
+
+        download_progress["external_task"] = {"status": "starting", "stage": "init"}
+
+        with patch("server_routes.get_downloader") as mock_get_downloader:
+            mock_get_downloader.return_value.download_and_merge = fake_download
+            task = asyncio.create_task(
+                run_download_task(
+                    task_id="external_task",
+                    repo_id="user/repo",
+                    model_path="root",
+                    files=["model.safetensors"],
+                    output_dir="/models",
+                    output_name="model",
+                )
+            )
+            await asyncio.to_thread(started.wait, 5)
+            task.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        assert download_progress["external_task"]["status"] == expected
+
+    @pytest.mark.asyncio
+    async def test_abort_concurrent_future(self, client):
+        """Test aborting a task registered as a concurrent.futures.Future"""
+        from server_routes import download_progress, download_tasks
+
+        future = concurrent.futures.Future()
+        download_tasks["coordinator_task"] = future
+
+        try:
+            response = await client.post("/hf_downloader/abort/coordinator_task")
+
+            assert response.status == 200
+            assert future.cancelled()
+            assert download_progress["coordinator_task"]["status"] == "cancelled"
+        finally:
+            download_tasks.pop("coordinator_task", None)
+            download_progress.pop("coordinator_task", None)
+
+
+class TestTaskRegistry:
+    """Test progress bookkeeping for download tasks"""
+
+    @pytest.mark.asyncio
+    async def test_run_download_task_updates_progress_in_place(self):
+        """Test that progress callbacks mutate the registered entry"""
+        from server_routes import download_progress, run_download_task
+
+        seen = []
+
+        def fake_download(progress_callback, **kwargs):
+            progress_callback("download", 1, 2, "Downloading")
+            seen.append(dict(download_progress["inplace_task"]))
+            return "/models/model.safetensors"
+
+        progress = {"status": "starting", "stage": "init", "current": 0, "total": 0}
+        download_progress["inplace_task"] = progress
+
+        try:
+            with patch("server_routes.get_downloader") as mock_get_downloader:
+                mock_get_downloader.return_value.download_and_merge = fake_download
+                await run_download_task(
+                    task_id="inplace_task",
+                    repo_id="user/repo",
+                    model_path="root",
+                    files=["model.safetensors"],
+                    output_dir="/models",
+                    output_name="model",
+                    name="model",
+                )
+
+            assert download_progress["inplace_task"] is progress
+            assert seen[0]["stage"] == "download"
+            assert seen[0]["current"] == 1
+            assert progress["status"] == "completed"
+            assert progress["output_path"] == "/models/model.safetensors"
+            assert "finished_at" in progress
+        finally:
+            download_progress.pop("inplace_task", None)
+
+    @pytest.mark.asyncio
+    async def test_progress_updates_are_coalesced(self):
+        """Test that rapid updates within a stage are dropped but boundaries are kept"""
+        from server_routes import download_progress, run_download_task
+
+        seen = []
+
+        def fake_download(progress_callback, **kwargs):
+            for current in range(5):
+                progress_callback("merge", current, 4, f"Merging {current}")
+                seen.append(download_progress["coalesce_task"]["current"])
+            return "/models/model.safetensors"
+
+        download_progress["coalesce_task"] = {"status": "starting", "stage": "init"}
+
+        try:
+            with (
+                patch("server_routes.get_downloader") as mock_get_downloader,
+                patch("server_routes.time.monotonic", return_value=100.0),
+            ):
+                mock_get_downloader.return_value.download_and_merge = fake_download
+                await run_download_task(
+                    task_id="coalesce_task",
+                    repo_id="user/repo",
+                    model_path="root",
+                    files=["model.safetensors"],
+                    output_dir="/models",
+                    output_name="model",
+                )
+
+            assert seen == [0, 0, 0, 0, 4]
+        finally:
+            download_progress.pop("coalesce_task", None)
+
+    @pytest.mark.asyncio
+    async def test_progress_burst_reaches_registry_rarely(self):
+        """Test that a tight burst of chunk updates causes only a few progress writes"""
+        from server_routes import download_progress, run_download_task
+
+        class CountingDict(dict):
+            writes = 0
+
+            def __setitem__(self, key, value):
+                if key == "current":
+                    CountingDict.writes += 1
+                super().__setitem__(key, value)
+
+        def fake_download(progress_callback, **kwargs):
+            for current in range(1, 1001):
+                progress_callback("download", current, 1000, "Downloading")
+            return "/models/model.safetensors"
+
+        download_progress["burst_task"] = CountingDict(status="starting", stage="download")
+
+        try:
+            with patch("server_routes.get_downloader") as mock_get_downloader:
+                mock_get_downloader.return_value.download_and_merge = fake_download
+                await run_download_task(
+                    task_id="burst_task",
+                    repo_id="user/repo",
+                    model_path="root",
+                    files=["model.safetensors"],
+                    output_dir="/models",
+                    output_name="model",
+                )
+
+            assert CountingDict.writes < 20
+        finally:
+            download_progress.pop("burst_task", None)
+
+    def test_reap_keeps_most_recent_finished_tasks(self):
+        """Test that finished history is capped while running tasks are kept"""
+        from server_routes import (
+            MAX_FINISHED_TASKS,
+            download_progress,
+            reap_finished_tasks,
+        )
+
+        now = 10_000.0
+        task_ids = [f"history_{i}" for i in range(MAX_FINISHED_TASKS + 10)]
+        for i, task_id in enumerate(task_ids):
+            download_progress[task_id] = {"status": "completed", "finished_at": now - 100 + i * 0.1}
+        download_progress["history_active"] = {"status": "running"}
+
+        try:
+            assert reap_finished_tasks(now) == 10
+            assert all(task_id not in download_progress for task_id in task_ids[:10])
+            assert all(task_id in download_progress for task_id in task_ids[10:])
+            assert "history_active" in download_progress
+        finally:
+            for task_id in [*task_ids, "history_active"]:
+                download_progress.pop(task_id, None)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_task_ignores_late_progress(self):
+        """Test that a worker still reporting after cancellation cannot revive the task"""
+        from server_routes import download_progress, run_download_task
+
+        def fake_download(progress_callback, **kwargs):
+            download_progress["late_task"]["status"] = "cancelled"
+            progress_callback("download", 1, 2, "Still downloading")
+            return "/models/model.safetensors"
+
+        download_progress["late_task"] = {"status": "starting", "stage": "init"}
+
+        try:
+            with patch("server_routes.get_downloader") as mock_get_downloader:
+                mock_get_downloader.return_value.download_and_merge = fake_download
+                await run_download_task(
+                    task_id="late_task",
+                    repo_id="user/repo",
+                    model_path="root",
+                    files=["model.safetensors"],
+                    output_dir="/models",
+                    output_name="model",
+                )
+
+            assert download_progress["late_task"]["status"] == "cancelled"
+            assert download_progress["late_task"]["stage"] == "init"
+        finally:
+            download_progress.pop("late_task", None)
+
+    def test_reap_finished_tasks(self):
+        """Test that only tasks finished longer than the TTL are removed"""
+        from server_routes import (
+            FINISHED_TASK_TTL,
+            download_progress,
+            download_tasks,
+            reap_finished_tasks,
+        )
+
+        now = 10_000.0
+        download_progress["old_task"] = {
+            "status": "completed",
+            "finished_at": now - FINISHED_TASK_TTL - 1,
+        }
+        download_progress["recent_task"] = {"status": "error", "finished_at": now - 1}
+        download_progress["active_task"] = {"status": "running"}
+        download_tasks["old_task"] = Mock()
+
+        try:
+            assert reap_finished_tasks(now) == 1
+            assert "old_task" not in download_progress
+            assert "old_task" not in download_tasks
+            assert "recent_task" in download_progress
+            assert "active_task" in download_progress
+        finally:
+            for task_id in ("old_task", "recent_task", "active_task"):
+                download_progress.pop(task_id, None)
+                download_tasks.pop(task_id, None)
+
 
 class TestListFilesHandler:
     """Test /hf_downloader/files/<model_type> endpoint"""
 
     @pytest.mark.asyncio
-    async def test_list_files_success(self, tmp_path):
+    async def test_list_files_success(self, client, tmp_path):
         """Test successful file listing"""
         # Create test directory and files
         test_dir = tmp_path / "checkpoints"
         test_dir.mkdir()
         test_file = test_dir / "test_model.safetensors"
         test_file.write_bytes(b"test data")
-
-        mock_request = Mock()
-        mock_request.match_info = {"model_type": "checkpoint"}
+        (test_dir / "notes.txt").write_text("not a model")
+        (test_dir / "diffusers.safetensors").mkdir()
 
         with patch("server_routes.get_model_dir", return_value=str(test_dir)):
-            response = await list_files_handler(mock_request)
+            response = await client.get("/hf_downloader/files/checkpoint")
             assert response.status == 200
 
+        files = (await response.json())["files"]
+        assert [(f["name"], f["size"], f["path"]) for f in files] == [
+            ("test_model.safetensors", 9, str(test_file))
+        ]
+
     @pytest.mark.asyncio
-    async def test_list_files_nonexistent_dir(self):
-        """Test listing files in non-existent directory"""
-        mock_request = Mock()
-        mock_request.match_info = {"model_type": "checkpoint"}
+    async def test_list_files_many(self, client, tmp_path):
+        """Test that a large model folder is listed completely and quickly"""
+        for i in range(1000):
+            (tmp_path / f"model_{i:04d}.safetensors").write_bytes(b"x")
+
+        started = time.perf_counter()
+        with patch("server_routes.get_model_dir", return_value=str(tmp_path)):
+            response = await client.get("/hf_downloader/files/checkpoint")
+            files = (await response.json())["files"]
+        elapsed = time.perf_counter() - started
 
+        assert response.status == 200
+        assert len(files) == 1000
+        assert elapsed < 2
+
+    @pytest.mark.asyncio
+    async def test_list_files_nonexistent_dir(self, client):
+        """Test listing files in non-existent directory"""
         with patch("server_routes.get_model_dir", return_value="/nonexistent/path"):
-            response = await list_files_handler(mock_request)
+            response = await client.get("/hf_downloader/files/checkpoint")
             assert response.status == 200  # Returns empty list, not error
 
 
@@ -342,56 +944,130 @@ class TestDeleteFileHandler:
     """Test /hf_downloader/files DELETE endpoint"""
 
     @pytest.mark.asyncio
-    async def test_delete_file_success(self, tmp_path):
+    async def test_delete_file_success(self, client, tmp_path):
         """Test successful file deletion"""
         # Create test file
         test_file = tmp_path / "test_model.safetensors"
         test_file.write_bytes(b"test data")
 
-        mock_request = Mock()
-        mock_request.json = AsyncMock(return_value={"filepath": str(test_file)})
-
         with patch("server_routes.folder_paths") as mock_folder_paths:
             mock_folder_paths.models_dir = str(tmp_path)
-            response = await delete_file_handler(mock_request)
+            response = await client.delete(
+                "/hf_downloader/files", json={"filepath": str(test_file)}
+            )
             assert response.status == 200
             assert not test_file.exists()
 
     @pytest.mark.asyncio
-    async def test_delete_file_missing_filepath(self):
-        """Test deletion with missing filepath"""
-        mock_request = Mock()
-        mock_request.json = AsyncMock(return_value={})
+    async def test_slow_deletes_do_not_block_progress(self, client, tmp_path):
+        """Test that progress polls are answered while deletes wait on a slow filesystem"""
+        from server_routes import download_progress
+
+        files = []
+        for i in range(4):
+            path = tmp_path / f"model_{i}.safetensors"
+            path.write_bytes(b"x")
+            files.append(path)
+
+        download_progress["poll_task"] = {"status": "running", "stage": "download"}
+
+        lock = threading.Lock()
+        entered = []
+        all_blocked = threading.Event()
+        release_unlink = threading.Event()
 
-        response = await delete_file_handler(mock_request)
+        def blocked_unlink(self, missing_ok=False):
+            with lock:
+                entered.append(self)
+                if len(entered) == len(files):
+                    all_blocked.set()
+            release_unlink.wait(5)
+
+        try:
+            with (
+                patch("server_routes.folder_paths") as mock_folder_paths,
+                patch.object(Path, "unlink", blocked_unlink),
+            ):
+                mock_folder_paths.models_dir = str(tmp_path)
+                deletes = [
+                    asyncio.create_task(
+                        client.delete("/hf_downloader/files", json={"filepath": str(path)})
+                    )
+                    for path in files
+                ]
+                assert await asyncio.to_thread(all_blocked.wait, 5)
+
+                statuses = []
+                for _ in range(20):
+                    response = await asyncio.wait_for(
+                        client.get("/hf_downloader/progress/poll_task"), timeout=5
+                    )
+                    statuses.append(response.status)
+                deletes_were_blocked = not any(task.done() for task in deletes)
+
+                release_unlink.set()
+                responses = await asyncio.gather(*deletes)
+
+            assert statuses == [200] * 20
+            assert deletes_were_blocked
+            assert all(response.status == 200 for response in responses)
+        finally:
+            release_unlink.set()
+            download_progress.pop("poll_task", None)
+
+    @pytest.mark.asyncio
+    async def test_delete_file_missing_filepath(self, client):
+        """Test deletion with missing filepath"""
+        response = await client.delete("/hf_downloader/files", json={})
         assert response.status == 400
 
     @pytest.mark.asyncio
-    async def test_delete_file_security_check(self, tmp_path):
+    async def test_delete_file_security_check(self, client, tmp_path):
         """Test security check prevents deletion outside models dir"""
         # Try to delete file outside models directory
         test_file = tmp_path / "outside" / "test.safetensors"
         test_file.parent.mkdir()
         test_file.write_bytes(b"test data")
 
-        mock_request = Mock()
-        mock_request.json = AsyncMock(return_value={"filepath": str(test_file)})
-
         with patch("server_routes.folder_paths") as mock_folder_paths:
             mock_folder_paths.models_dir = str(tmp_path / "models")
-            response = await delete_file_handler(mock_request)
+            response = await client.delete(
+                "/hf_downloader/files", json={"filepath": str(test_file)}
+            )
             assert response.status == 403
             assert test_file.exists()  # File should not be deleted
 
     @pytest.mark.asyncio
-    async def test_delete_file_not_found(self, tmp_path):
+    @pytest.mark.parametrize("escape", ["symlink", "sibling"])
+    async def test_delete_file_rejects_escapes(self, client, tmp_path, escape):
+        """Test that symlinks out of models dir and look-alike sibling folders are rejected"""
+        models_dir = tmp_path / "models"
+        models_dir.mkdir()
+        outside = tmp_path / "models_old" / "secret.safetensors"
+        outside.parent.mkdir()
+        outside.write_bytes(b"keep me")
+
+        if escape == "symlink":
+            target = models_dir / "link.safetensors"
+            target.symlink_to(outside)
+        else:
+            target = outside
+
+        with patch("server_routes.folder_paths") as mock_folder_paths:
+            mock_folder_paths.models_dir = str(models_dir)
+            response = await client.delete("/hf_downloader/files", json={"filepath": str(target)})
+
+        assert response.status == 403
+        assert outside.read_bytes() == b"keep me"
+
+    @pytest.mark.asyncio
+    async def test_delete_file_not_found(self, client, tmp_path):
         """Test deletion of non-existent file"""
         nonexistent = tmp_path / "models" / "nonexistent.safetensors"
 
-        mock_request = Mock()
-        mock_request.json = AsyncMock(return_value={"filepath": str(nonexistent)})
-
         with patch("server_routes.folder_paths") as mock_folder_paths:
             mock_folder_paths.models_dir = str(tmp_path / "models")
-            response = await delete_file_handler(mock_request)
+            response = await client.delete(
+                "/hf_downloader/files", json={"filepath": str(nonexistent)}
+            )
             assert response.status == 404
@@ -51,11 +51,17 @@ function addMenuButton() {
     console.log("[HF Downloader] Button group added to parent container");
 }
 
+// Statuses of downloads that are still doing work; "cancelling" runs until its worker stops
+const ACTIVE_STATUSES = ["running", "queued", "starting", "cancelling"];
+
 // Main UI class
 class HFDownloaderUI {
     constructor() {
         this.modal = null;
         this.currentTasks = new Map();
+        this.pollingTasks = new Set();
+        this.progressInterval = null;
+        this.progressEtag = null;
         this.buildModal();
     }
 
@@ -509,22 +515,60 @@ class HFDownloaderUI {
             };
         }
 
-        const pollInterval = setInterval(async () => {
-            try {
-                const response = await api.fetchApi(`/hf_downloader/progress/${taskId}`);
-                const progress = await response.json();
+        this.pollingTasks.add(taskId);
+        this.startProgressPolling();
+    }
+
+    startProgressPolling() {
+        if (this.progressInterval) return;
+        // One request per tick covers every in-flight download
+        this.progressInterval = setInterval(() => this.pollProgress(), 500);
+    }
+
+    stopProgressPolling() {
+        if (this.progressInterval) {
+            clearInterval(this.progressInterval);
+            this.progressInterval = null;
+        }
+    }
+
+    async pollProgress() {
+        try {
+            const headers = { "Content-Type": "application/json" };
+            if (this.progressEtag) headers["If-None-Match"] = this.progressEtag;
+            const response = await api.fetchApi("/hf_downloader/progress_batch", {
+                method: "POST",
+                headers,
+                body: JSON.stringify({ task_ids: [...this.pollingTasks] })
+            });
+            // Nothing changed since the last poll
+            if (response.status === 304) return;
+            this.progressEtag = response.headers.get("ETag");
+            const data = await response.json();
+            if (!data.tasks) return;
+
+            for (const [taskId, progress] of Object.entries(data.tasks)) {
+                if (!this.pollingTasks.has(taskId)) continue;
+                if (progress.status === "not_found") {
+                    this.pollingTasks.delete(taskId);
+                    continue;
+                }
 
                 this.updateProgress(taskId, progress);
 
                 if (progress.status === "completed" || progress.status === "error" || progress.status === "cancelled") {
-                    clearInterval(pollInterval);
-                    this.addProgressActions(taskId, progress.status, modelName);
+                    this.pollingTasks.delete(taskId);
+                    this.addProgressActions(taskId, progress.status, this.currentTasks.get(taskId)?.modelName);
                 }
-            } catch (error) {
-                console.error("Error polling progress:", error);
-                clearInterval(pollInterval);
             }
-        }, 500);
+        } catch (error) {
+            console.error("Error polling progress:", error);
+            this.pollingTasks.clear();
+        }
+
+        if (this.pollingTasks.size === 0) {
+            this.stopProgressPolling();
+        }
     }
 
     updateProgress(taskId, progress) {
@@ -536,7 +580,8 @@ class HFDownloaderUI {
         console.log(`[HF Downloader] Progress update for ${taskId}:`, progress);
 
         if (stageEl) {
-            stageEl.textContent = progress.stage.toUpperCase();
+            // A stopping download keeps its stage; say that it is being cancelled instead
+            stageEl.textContent = progress.status === "cancelling" ? "CANCELLING" : progress.stage.toUpperCase();
             // Color coding for status
             if (progress.status === "error") {
                 stageEl.style.color = "#ff6b6b";
@@ -645,7 +690,7 @@ class HFDownloaderUI {
     }
 
     updateStatusBadge(items) {
-        const active = items.filter(i => i.status === "running" || i.status === "queued" || i.status === "starting").length;
+        const active = items.filter(i => ACTIVE_STATUSES.includes(i.status)).length;
         if (this.statusBadge) {
             this.statusBadge.textContent = active;
             this.statusBadge.style.display = active > 0 ? "inline-block" : "none";
@@ -654,7 +699,7 @@ class HFDownloaderUI {
 
     renderStatus(items) {
         const cleared = this._clearedItems || new Set();
-        const active = items.filter(i => ["running", "queued", "starting"].includes(i.status));
+        const active = items.filter(i => ACTIVE_STATUSES.includes(i.status));
         const done   = items.filter(i => i.status === "completed" && !cleared.has(i.task_id));
         const failed = items.filter(i => ["error", "cancelled"].includes(i.status) && !cleared.has(i.task_id));
 
@@ -701,7 +746,7 @@ class HFDownloaderUI {
                     <div ${barStyle}></div>
                 </div>
                 ${msg ? `<div class="hf-status-item-msg">${msg}</div>` : ""}
-                ${(status === "running" || status === "queued" || status === "starting") && tid
+                ${ACTIVE_STATUSES.includes(status) && tid
                     ? `<button class="hf-status-abort-btn" data-tid="${tid}">Abort</button>`
                     : ""}
             `;
@@ -1306,6 +1351,7 @@ function addStyles() {
         .hf-pill-starting  { background: #1c4fa0; color: #90c4ff; }
         .hf-pill-completed { background: #1a4a2a; color: #4ade80; }
         .hf-pill-error     { background: #4a1a1a; color: #ff6b6b; }
+        .hf-pill-cancelling { background: #5a3d00; color: #ffc947; }
         .hf-pill-cancelled { background: #3a3a3a; color: #aaa; }
         .hf-pill-unknown   { background: #333;    color: #888; }
 